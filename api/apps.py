@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        from api import cache
+        from core import signals
+
+        signals.installments_collected.connect(cache.on_installments_collected, dispatch_uid='api.cache.installments')
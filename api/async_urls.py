@@ -0,0 +1,11 @@
+from django.urls import path
+from api import async_views
+
+app_name = 'api-async'
+
+urlpatterns = [
+    path('accounts/', async_views.account_list),
+    path('accounts/<int:pk>/', async_views.account_detail),
+    path('transfer/<int:pk>/statement/', async_views.statement),
+    path('credit/<int:pk>', async_views.credit_list),
+]
@@ -0,0 +1,92 @@
+""" Versões assíncronas (ASGI) das rotas de leitura mais acessadas
+
+O DRF não executa views assíncronas, então estas são views do Django que
+usam o ORM assíncrono (aget, async for) e reaproveitam os serializadores
+do DRF apenas para formatar objetos já carregados (sem acesso ao banco).
+Sob WSGI elas continuam funcionando, mas o ganho só aparece em ASGI.
+"""
+import functools
+
+from django.http import JsonResponse
+from rest_framework import status
+from rest_framework.exceptions import APIException, NotAuthenticated
+from core import ledger, lending, models
+from core.authentication import CachedJWTAuthentication
+from api import serializers
+from api.pagination import CreditPagination, KeysetPagination
+
+jwt_authentication = CachedJWTAuthentication()
+
+
+async def authenticate(request):
+    # Mesma validação do CachedJWTAuthentication, com o ORM assíncrono na falta de cache
+    header = jwt_authentication.get_header(request)
+    raw_token = jwt_authentication.get_raw_token(header) if header else None
+    if raw_token is None:
+        raise NotAuthenticated()
+
+    token = jwt_authentication.get_validated_token(raw_token)
+    return await jwt_authentication.aget_user(token)
+
+
+def async_api_view(view):
+    # Autentica via JWT, aceita apenas GET e converte erros do DRF em JSON
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method != 'GET':
+            return JsonResponse({'detail': f'Method "{request.method}" not allowed.'},
+                                status=status.HTTP_405_METHOD_NOT_ALLOWED)
+        try:
+            request.user = await authenticate(request)
+            return await view(request, *args, **kwargs)
+        except APIException as e:
+            detail = e.detail if isinstance(e.detail, (dict, list)) else {'detail': e.detail}
+            return JsonResponse(detail, status=e.status_code, safe=False)
+    return wrapper
+
+
+@async_api_view
+async def account_list(request):
+    # Lista as contas do usuário autenticado
+    accounts = [
+        account async for account in
+        models.Account.objects.filter(user=request.user).order_by('-created_at')
+    ]
+    return JsonResponse(serializers.AccountSerializer(accounts, many=True).data, safe=False)
+
+
+@async_api_view
+async def account_detail(request, pk):
+    # Detalhe de uma conta do usuário autenticado
+    try:
+        account = await ledger.with_balance(models.Account.objects.filter(user=request.user)).aget(pk=pk)
+    except models.Account.DoesNotExist:
+        return JsonResponse({'detail': 'Not found.'}, status=status.HTTP_404_NOT_FOUND)
+    return JsonResponse(serializers.AccountDetailSerializer(account).data)
+
+
+@async_api_view
+async def statement(request, pk):
+    # Extrato paginado por cursor, como em TansferViewSet.statement (só do dono da conta)
+    if not await models.Account.objects.filter(pk=pk, user=request.user).aexists():
+        return JsonResponse({'detail': 'Not found.'}, status=status.HTTP_404_NOT_FOUND)
+
+    base = models.Transfer.objects.select_related('sender__user', 'receiver__user')
+    paginator = KeysetPagination()
+    page = await paginator.apaginate_union([base.filter(sender=pk), base.filter(receiver=pk)], request)
+    serializer = serializers.TransferStatementSerializer(page, many=True)
+
+    return JsonResponse(paginator.get_paginated_data(serializer.data))
+
+
+@async_api_view
+async def credit_list(request, pk):
+    # Créditos paginados de uma conta do usuário, como em CreditViewSet.list
+    queryset = lending.with_open_installments(models.Credit.objects.filter(account=pk, account__user=request.user))
+    paginator = CreditPagination()
+    page = await paginator.apaginate_union([queryset], request)
+    if not page and not await models.Account.objects.filter(pk=pk, user=request.user).aexists():
+        return JsonResponse({'detail': 'Not found.'}, status=status.HTTP_404_NOT_FOUND)
+    serializer = serializers.CreditListSerializer(page, many=True)
+
+    return JsonResponse(paginator.get_paginated_data(serializer.data))
@@ -0,0 +1,106 @@
+""" Cache das respostas de leitura de contas e créditos
+
+As respostas são guardadas no framework de cache do Django (LocMemCache
+quando nada é configurado) junto com o ETag do corpo. Quem escreve
+(depósito, saque, transferência, empréstimo, crédito) invalida as chaves
+afetadas; quem lê recebe 304 sem serialização quando o ETag não mudou.
+"""
+import hashlib
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def get_cache():
+    return caches[getattr(settings, 'API_CACHE_ALIAS', 'default')]
+
+
+def account_key(account_id):
+    return f"api:account:{account_id}"
+
+
+def account_list_key(user_id):
+    return f"api:accounts:user:{user_id}"
+
+
+def credit_list_key(account_id):
+    return f"api:credits:{account_id}"
+
+
+def _count(name):
+    with _stats_lock:
+        _stats[name] += 1
+
+
+def stats():
+    """Contadores de acerto/erro do cache neste processo"""
+    with _stats_lock:
+        return dict(_stats)
+
+
+def etag_for(data):
+    return '"%s"' % hashlib.md5(JSONRenderer().render(data)).hexdigest()
+
+
+def _not_modified(request, etag):
+    return etag in request.headers.get('If-None-Match', '')
+
+
+def cached_response(request, key, build):
+    """Retorna a resposta guardada em `key` ou chama `build()` e guarda o resultado.
+
+    A entrada guarda o id de quem a gerou, então um usuário nunca recebe
+    a resposta montada para outro; nesse caso a view é executada normalmente.
+    """
+    cache = get_cache()
+    entry = cache.get(key)
+
+    if entry is not None and entry['owner'] == request.user.pk:
+        _count('hits')
+        if _not_modified(request, entry['etag']):
+            _count('not_modified')
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': entry['etag'], 'X-Cache': 'HIT'})
+        return Response(entry['data'], headers={'ETag': entry['etag'], 'X-Cache': 'HIT'})
+
+    _count('misses')
+    response = build()
+    if response.status_code != status.HTTP_200_OK:
+        return response
+
+    etag = etag_for(response.data)
+    cache.set(key, {'owner': request.user.pk, 'etag': etag, 'data': response.data},
+              getattr(settings, 'API_CACHE_TIMEOUT', 300))
+
+    response['ETag'] = etag
+    response['X-Cache'] = 'MISS'
+    if _not_modified(request, etag):
+        return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag, 'X-Cache': 'MISS'})
+    return response
+
+
+def on_installments_collected(sender, kind, accounts, **kwargs):
+    # Receptor de core.signals.installments_collected (conectado em ApiConfig.ready)
+    keys = [account_key(pk) for pk in accounts]
+    if kind == 'credit':
+        # O saldo restante dos créditos aparece na listagem
+        keys += [credit_list_key(pk) for pk in accounts]
+    invalidate(*keys)
+
+
+def invalidate(*keys):
+    get_cache().delete_many(keys)
+    _count('invalidations')
+    # Dentro de uma transação (ex.: core.idempotency) uma leitura concorrente
+    # ainda vê os dados antigos e pode guardá-los; apaga de novo no commit
+    connection = transaction.get_connection()
+    if connection.in_atomic_block:
+        connection.on_commit(lambda: get_cache().delete_many(keys))
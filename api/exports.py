@@ -0,0 +1,95 @@
+""" Exportação do extrato em streaming (CSV e NDJSON)
+
+As linhas vêm direto do cursor do banco (`values_list().iterator()`), sem
+instanciar modelos nem serializadores, e são escritas na resposta conforme
+são lidas; a memória usada não depende do tamanho do histórico.
+"""
+import csv
+import datetime
+import heapq
+import json
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from core.models import Transfer
+
+FIELDS = ['id', 'created_at', 'sender', 'receiver', 'value', 'description']
+CHUNK_SIZE = 2000
+
+
+def parse_period(params):
+    # Lê ?start=AAAA-MM-DD&end=AAAA-MM-DD (ambos inclusivos); levanta ValueError se inválidos
+    period = {}
+    for name in ('start', 'end'):
+        value = params.get(name)
+        if value:
+            try:
+                date = parse_date(value)
+            except ValueError:
+                # Formato certo, data inexistente (ex.: 2024-13-45)
+                date = None
+            if date is None:
+                raise ValueError(name)
+            period[name] = date
+    return period.get('start'), period.get('end')
+
+
+def statement_rows(account_id, start=None, end=None, chunk_size=CHUNK_SIZE):
+    """Gera as transferências da conta em ordem cronológica, como tuplas"""
+    transfers = Transfer.objects.all()
+    if start is not None:
+        transfers = transfers.filter(created_at__gte=timezone.make_aware(
+            datetime.datetime.combine(start, datetime.time.min)))
+    if end is not None:
+        transfers = transfers.filter(created_at__lt=timezone.make_aware(
+            datetime.datetime.combine(end + datetime.timedelta(days=1), datetime.time.min)))
+
+    # Uma consulta por lado, cada uma no seu índice (sender/receiver, created_at)
+    halves = [
+        transfers.filter(**{side: account_id})
+        .order_by('created_at', 'id')
+        .values_list(*FIELDS)
+        .iterator(chunk_size=chunk_size)
+        for side in ('sender', 'receiver')
+    ]
+
+    last_id = None
+    for row in heapq.merge(*halves, key=lambda row: (row[1], row[0])):
+        # Uma transferência da conta para ela mesma aparece nas duas metades
+        if row[0] != last_id:
+            last_id = row[0]
+            yield row
+
+
+class Echo:
+    # Pseudo-buffer: o csv.writer devolve a linha em vez de acumulá-la
+    def write(self, value):
+        return value
+
+
+def csv_stream(rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(FIELDS)
+    for row in rows:
+        yield writer.writerow(
+            [row[0], row[1].isoformat(), row[2] or '', row[3] or '', row[4], row[5] or '']
+        )
+
+
+def ndjson_stream(rows):
+    for row in rows:
+        yield json.dumps({
+            'id': row[0],
+            'created_at': row[1].isoformat(),
+            'sender': row[2],
+            'receiver': row[3],
+            'value': str(row[4]),
+            'description': row[5],
+        }) + '\n'
+
+
+FORMATS = {
+    'csv': ('text/csv', csv_stream),
+    'ndjson': ('application/x-ndjson', ndjson_stream),
+}
@@ -0,0 +1,133 @@
+import base64
+import heapq
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination:
+    """ Paginação por cursor (keyset) sobre (created_at, id) em ordem decrescente
+
+    Em vez de OFFSET, cada página continua a partir da última linha da anterior
+    (`WHERE (created_at, id) < cursor`), então o custo de uma página não
+    depende da profundidade do histórico. Subclasses podem trocar a coluna
+    de data em `cursor_field`.
+    """
+    cursor_field = 'created_at'
+    page_size = 50
+    max_page_size = 200
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'limit'
+
+    def get_params(self, request):
+        # Aceita tanto o Request do DRF quanto o HttpRequest das views assíncronas
+        return getattr(request, 'query_params', request.GET)
+
+    def get_page_size(self, request):
+        try:
+            size = int(self.get_params(request).get(self.page_size_query_param, self.page_size))
+        except ValueError:
+            raise ValidationError({self.page_size_query_param: 'valor inválido'})
+        return max(1, min(size, self.max_page_size))
+
+    def encode_cursor(self, obj):
+        raw = f"{getattr(obj, self.cursor_field).isoformat()}|{obj.pk}"
+        return base64.urlsafe_b64encode(raw.encode()).decode()
+
+    def decode_cursor(self, request):
+        value = self.get_params(request).get(self.cursor_query_param)
+        if not value:
+            return None
+        try:
+            created_at, pk = base64.urlsafe_b64decode(value.encode()).decode().split('|')
+            created_at = parse_datetime(created_at)
+            pk = int(pk)
+        except (ValueError, UnicodeDecodeError):
+            created_at = None
+        if created_at is None:
+            raise ValidationError({self.cursor_query_param: 'cursor inválido'})
+        return created_at, pk
+
+    def filter_queryset(self, queryset, cursor):
+        # Aplica o cursor e a ordenação que casam com os índices (lado, created_at)
+        field = self.cursor_field
+        if cursor is not None:
+            value, pk = cursor
+            queryset = queryset.filter(Q(**{f'{field}__lt': value}) | Q(**{field: value, 'pk__lt': pk}))
+        return queryset.order_by(f'-{field}', '-pk')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        # Interface de paginação do DRF (ListAPIView e afins)
+        limit, cursor = self.prepare(request)
+        return self.merge([list(self.filter_queryset(queryset, cursor)[:limit])], limit)
+
+    def paginate_union(self, querysets, request):
+        """Pagina a união de vários querysets já filtrados.
+
+        Cada metade é consultada separadamente (e usa o seu próprio índice)
+        com no máximo `page_size + 1` linhas; as metades são então mescladas
+        em memória, o que equivale a um UNION ... ORDER BY ... LIMIT.
+        """
+        limit, cursor = self.prepare(request)
+        halves = [list(self.filter_queryset(qs, cursor)[:limit]) for qs in querysets]
+        return self.merge(halves, limit)
+
+    async def apaginate_union(self, querysets, request):
+        # Versão assíncrona de paginate_union, usando o ORM assíncrono
+        limit, cursor = self.prepare(request)
+        halves = [[obj async for obj in self.filter_queryset(qs, cursor)[:limit]] for qs in querysets]
+        return self.merge(halves, limit)
+
+    def prepare(self, request):
+        self.request = request
+        self.page_size_value = self.get_page_size(request)
+        return self.page_size_value + 1, self.decode_cursor(request)
+
+    def merge(self, halves, limit):
+        merged = heapq.merge(*halves, key=lambda obj: (getattr(obj, self.cursor_field), obj.pk), reverse=True)
+
+        page, seen = [], set()
+        for obj in merged:
+            # Uma transferência da conta para ela mesma aparece nas duas metades
+            if obj.pk in seen:
+                continue
+            seen.add(obj.pk)
+            page.append(obj)
+            if len(page) == limit:
+                break
+
+        self.has_next = len(page) > self.page_size_value
+        self.page = page[:self.page_size_value]
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.page[-1]))
+
+    def get_paginated_data(self, data):
+        return {
+            'next': self.get_next_link(),
+            'results': data,
+        }
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data))
+
+
+class LoanPagination(KeysetPagination):
+    """Empréstimos mais recentes primeiro, pelo índice (conta, request_date, id)"""
+    cursor_field = 'request_date'
+    page_size = 20
+    max_page_size = 100
+
+
+class CreditPagination(KeysetPagination):
+    """Créditos mais recentes primeiro, pelo índice (conta, date, id)"""
+    cursor_field = 'date'
+    page_size = 20
+    max_page_size = 100
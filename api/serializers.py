@@ -1,6 +1,9 @@
+import decimal
+from django.conf import settings
 from rest_framework import serializers
 from core.models import *
 from user.serializers import UserSerializer
+from core import amortization, ledger
 
 class AccountSerializer(serializers.ModelSerializer):
     # Serializa os dados do modelo Account
@@ -22,6 +25,15 @@ class AccountUserSerializer(serializers.ModelSerializer):
 
 class AccountDetailSerializer(AccountSerializer):
     # Estende AccountSerializer e inclui campos adicionais
+    # Saldo do ledger: anotado pela view (ledger.with_balance) ou calculado aqui
+    balance = serializers.SerializerMethodField()
+
+    def get_balance(self, obj):
+        current = getattr(obj, 'current_balance', None)
+        if current is None:
+            current = ledger.balance(obj.pk)
+        return serializers.DecimalField(max_digits=12, decimal_places=2).to_representation(current)
+
     class Meta(AccountSerializer.Meta):
         fields = AccountSerializer.Meta.fields + ['id', 'balance', 'created_at', 'nickname']
         # Define campos adicionais como somente leitura
@@ -41,6 +53,11 @@ class TransferDetailSerializer(serializers.ModelSerializer):
         model = Transfer
         fields = ['value', 'sender', 'receiver', 'description']
 
+class TransferStatementSerializer(TransferDetailSerializer):
+    # Linha do extrato; inclui id e data, usados pelo cursor da paginação
+    class Meta(TransferDetailSerializer.Meta):
+        fields = ['id', 'created_at'] + TransferDetailSerializer.Meta.fields
+
 class CreateTransferDetailSerializer(serializers.ModelSerializer):
     # Serializador para a criação de uma transferência, sem incluir informações completas dos usuários
     value = serializers.DecimalField(max_digits=8, decimal_places=2)
@@ -59,24 +76,78 @@ class TransferSerializer(serializers.ModelSerializer):
         model = Transfer
         fields = ['value', 'sender', 'receiver', 'description']
 
-class LoanSerializer(serializers.ModelSerializer):
+class BatchTransferSerializer(serializers.Serializer):
+    # Lote de transferências de uma mesma conta; cada item é validado em core.ledger
+    sender = serializers.IntegerField()
+    transfers = serializers.ListField(
+        child=serializers.DictField(),
+        allow_empty=False,
+        max_length=getattr(settings, 'TRANSFER_BATCH_MAX_ITEMS', 500),
+    )
+
+class OwnedAccountMixin:
+    # A conta informada precisa ser do usuário da requisição (passada no contexto)
+    def validate_account(self, account):
+        request = self.context.get('request')
+        if request is None or account.user_id != request.user.pk:
+            raise serializers.ValidationError(ledger.AccountNotOwned.message)
+        return account
+
+class LoanSerializer(OwnedAccountMixin, serializers.ModelSerializer):
     # Serializa os dados do modelo Loan
     class Meta:
         model = Loan
         fields = ['account', 'installments', 'value']
 
+class LoanInstallmentItemSerializer(serializers.ModelSerializer):
+    # Parcela dentro da listagem de empréstimos (sem o id do empréstimo, que já é o pai)
+    class Meta:
+        model = LoanInstallments
+        fields = ['id', 'due_date', 'payed_date', 'value']
+
+class LoanListSerializer(serializers.ModelSerializer):
+    # Empréstimo na listagem: só os campos do próprio registro, sem consultas extras
+    class Meta:
+        model = Loan
+        fields = ['id', 'account', 'value', 'installments', 'fees', 'request_date', 'payed']
+
+class LoanWithInstallmentsSerializer(LoanListSerializer):
+    # Listagem com ?include=installments; as parcelas vêm do prefetch da view
+    schedule = LoanInstallmentItemSerializer(source='loaninstallments_set', many=True, read_only=True)
+
+    class Meta(LoanListSerializer.Meta):
+        fields = LoanListSerializer.Meta.fields + ['schedule']
+
+class LoanSimulationSerializer(serializers.Serializer):
+    # Parâmetros de uma simulação de empréstimo (query string de loan/simulate)
+    value = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=decimal.Decimal('0.01'))
+    installments = serializers.IntegerField(min_value=1, max_value=480)
+    # Taxa mensal limitada a 100%; acima disso a tabela só serve para gastar CPU
+    rate = serializers.DecimalField(max_digits=7, decimal_places=6, min_value=0, max_value=1, required=False)
+    system = serializers.ChoiceField(choices=amortization.SYSTEMS, default='price')
+    schedule = serializers.BooleanField(default=True)
+
 class LoanInstallmentsSerializer(serializers.ModelSerializer):
     # Serializa os dados do modelo LoanInstallments com todos os campos
     class Meta:
         model = LoanInstallments
         fields = '__all__'
 
-class CreditSerializer(serializers.ModelSerializer):
+class CreditSerializer(OwnedAccountMixin, serializers.ModelSerializer):
     # Serializa os dados do modelo Credit
     class Meta:
         model = Credit
         fields = ['account', 'installments', 'value']
 
+class CreditListSerializer(serializers.ModelSerializer):
+    # Crédito na listagem, com o resumo das parcelas em aberto anotado pela view
+    remaining_balance = serializers.DecimalField(max_digits=12, decimal_places=2, read_only=True)
+    next_due_date = serializers.DateTimeField(read_only=True)
+
+    class Meta:
+        model = Credit
+        fields = ['id', 'account', 'value', 'installments', 'date', 'payed', 'remaining_balance', 'next_due_date']
+
 class CreditInstallmentsSerializer(serializers.ModelSerializer):
     # Serializa os dados do modelo CreditInstallments com campos específicos
     class Meta:
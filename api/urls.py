@@ -1,4 +1,4 @@
-from django.urls import path, include
+from django.urls import path, re_path, include
 from api import views
 from rest_framework.routers import DefaultRouter
 
@@ -9,8 +9,11 @@ router.register('transfer', views.TansferViewSet)
 app_name = 'api'
 
 urlpatterns = [
+    # Antes do router, que trataria o ".csv" como sufixo de formato do extrato
+    re_path(r'^transfer/(?P<pk>\d+)/statement\.(?P<fmt>csv|ndjson)$', views.TansferViewSet.as_view({'get': 'export'})),
     path('', include(router.urls)),
     path('loan/',views.LoanViewSet.as_view()),
+    path('loan/simulate',views.LoanSimulationView.as_view()),
     path('credit/',views.CreditViewSet.as_view()),
     path('credit/<int:pk>',views.CreditViewSet.as_view()),
 ]
\ No newline at end of file
@@ -4,36 +4,66 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.decorators import action
 
-# Importações específicas para autenticação JWT
-from rest_framework_simplejwt import authentication as authenticationJWT
-
 # Importações do Django para consultas no banco de dados
-from django.db.models import Q
+from django.db import IntegrityError, transaction
+from django.db.models import Prefetch
+from django.http import StreamingHttpResponse
 
 # Importações de modelos e serializadores da aplicação
-from core import models
+from core import amortization, models, ledger, lending, numbering, snapshots, summaries
+from core.authentication import CachedJWTAuthentication
+from core.idempotency import idempotent
+from core.routers import ReplicaReadMixin
 from api import serializers
+from api.pagination import CreditPagination, KeysetPagination, LoanPagination
+from api import cache, exports
 
 # Importações adicionais para manipulação de datas e números
-import random, decimal, datetime
-from dateutil.relativedelta import relativedelta
+import decimal
 
 # Definição de uma viewset para manipulação de contas
-class AccountViewSet(viewsets.ModelViewSet):
+class AccountViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     # Configurações básicas do viewset
     queryset = models.Account.objects.all()
-    authentication_classes = [authenticationJWT.JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
         # Filtra as contas apenas para o usuário autenticado e as ordena pela data de criação
-        return self.queryset.filter(user=self.request.user).order_by('-created_at')
+        queryset = self.queryset.filter(user=self.request.user).order_by('-created_at')
+        if self.action == 'retrieve':
+            # O detalhe mostra o saldo, calculado na mesma query
+            queryset = ledger.with_balance(queryset)
+        return queryset
     
     def get_serializer_class(self):
         # Escolhe o serializador com base na ação (retrieve, create, etc.)
         if self.action == 'retrieve' or self.action == 'create':
             return serializers.AccountDetailSerializer
         return serializers.AccountSerializer
+
+    def list(self, request, *args, **kwargs):
+        # Lista das contas do usuário, servida do cache quando possível
+        return cache.cached_response(
+            request, cache.account_list_key(request.user.pk),
+            lambda: super(AccountViewSet, self).list(request, *args, **kwargs),
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        # Detalhe da conta (com saldo), servido do cache quando possível
+        return cache.cached_response(
+            request, cache.account_key(kwargs['pk']),
+            lambda: super(AccountViewSet, self).retrieve(request, *args, **kwargs),
+        )
+
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+        cache.invalidate(cache.account_key(serializer.instance.pk), cache.account_list_key(self.request.user.pk))
+
+    def perform_destroy(self, instance):
+        pk = instance.pk
+        super().perform_destroy(instance)
+        cache.invalidate(cache.account_key(pk), cache.account_list_key(self.request.user.pk))
     
     def create(self, request, *args, **kwargs):
         # Criação de uma nova conta
@@ -46,83 +76,119 @@ class AccountViewSet(viewsets.ModelViewSet):
                 # Retorna um erro se o campo 'nickname' não estiver presente
                 return Response({"error": "sem nickname"}, status=status.HTTP_400_BAD_REQUEST)
             
-            # Gera um número de conta aleatório
-            account_number = "".join([str(random.randint(0, 9)) for _ in range(16)])
-
-            # Cria uma nova conta com os dados fornecidos
-            account = models.Account(
-                user=self.request.user,
-                number=account_number,
-                agency="0001",
-                nickname=nickname
-            )
-
-            account.balance = decimal.Decimal(0)
-            account.save()
+            # Cria uma nova conta com um número do bloco reservado por este processo;
+            # se colidir com um número antigo (aleatório), usa o próximo
+            for _ in range(3):
+                account = models.Account(
+                    user=self.request.user,
+                    number=numbering.allocator.allocate("0001"),
+                    agency="0001",
+                    nickname=nickname
+                )
+                account.balance = decimal.Decimal(0)
+                try:
+                    with transaction.atomic():
+                        account.save()
+                    break
+                except IntegrityError:
+                    continue
+            else:
+                return Response({'message': 'não foi possível gerar o número da conta'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+            cache.invalidate(cache.account_list_key(request.user.pk))
 
             return Response({'message': 'Conta Criada'}, status=status.HTTP_201_CREATED)
 
+    @action(methods=['GET'], detail=False, url_path='lookup')
+    def lookup(self, request):
+        # Busca uma conta (de qualquer usuário) por agência e número, pelo índice único
+        agency = request.query_params.get('agency')
+        number = request.query_params.get('number')
+        if not agency or not number:
+            return Response({'message': 'agency e number são obrigatórios'}, status=status.HTTP_400_BAD_REQUEST)
+
+        account = models.Account.objects.filter(agency=agency, number=number).first()
+        if account is None:
+            return Response({'message': 'conta não encontrada'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(serializers.AccountSerializer(account).data, status=status.HTTP_200_OK)
+
     @action(methods=['POST'], detail=True, url_path='withdraw')
+    @idempotent
     def withdraw(self, request, pk=None):
         # Realiza uma retirada de uma conta
-        account = models.Account.objects.get(id=pk)
         serializer = serializers.ValueSerialzier(data=request.data)
 
         if serializer.is_valid():
-            # Obtém o valor a ser retirado e o saldo atual da conta
-            withdraw_value = decimal.Decimal(serializer.validated_data.get('value'))
-            balance = decimal.Decimal(account.balance)
-
-            comparar = balance.compare(withdraw_value)
-
-            if comparar == 0 or comparar == 1:
-                # Atualiza o saldo da conta e registra a transferência
-                account.balance = 0 if balance - withdraw_value <= 0 else balance - withdraw_value
-                account.save()
-                self.save_in_tranfer(account.id, None, withdraw_value)
-
-                return Response({"balance": account.balance}, status=status.HTTP_200_OK)
-            
-            # Retorna um erro se o saldo for insuficiente
-            return Response({'message': 'saldo insuficiente'}, status=status.HTTP_401_UNAUTHORIZED)
+            # Debita o saldo e registra a transferência em uma única transação
+            try:
+                balance = ledger.withdraw(pk, serializer.validated_data.get('value'), user=request.user)
+            except ledger.InsufficientBalance:
+                # Retorna um erro se o saldo for insuficiente
+                return Response({'message': 'saldo insuficiente'}, status=status.HTTP_401_UNAUTHORIZED)
+            except ledger.AccountNotFound as e:
+                return Response({'message': e.message}, status=status.HTTP_404_NOT_FOUND)
+            except ledger.AccountNotOwned as e:
+                return Response({'message': e.message}, status=status.HTTP_403_FORBIDDEN)
+            except ledger.LedgerError as e:
+                return Response({'message': e.message}, status=status.HTTP_400_BAD_REQUEST)
+
+            cache.invalidate(cache.account_key(pk))
+            return Response({"balance": balance}, status=status.HTTP_200_OK)
         
         # Retorna erros de validação se o serializer não for válido
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
     @action(methods=['POST'], detail=True, url_path='deposit')
+    @idempotent
     def deposit(self, request, pk=None):
         # Realiza um depósito em uma conta
-        account = models.Account.objects.get(id=pk)
         serializer = serializers.ValueSerialzier(data=request.data)
         
         if serializer.is_valid():
-            # Atualiza o saldo da conta e registra a transferência
-            account.balance += decimal.Decimal(serializer.validated_data.get('value'))
-            account.save()
-            self.save_in_tranfer(None, account.id, serializer.validated_data.get('value'))
+            # Credita o saldo e registra a transferência em uma única transação
+            try:
+                balance = ledger.deposit(pk, serializer.validated_data.get('value'), user=request.user)
+            except ledger.AccountNotFound as e:
+                return Response({'message': e.message}, status=status.HTTP_404_NOT_FOUND)
+            except ledger.AccountNotOwned as e:
+                return Response({'message': e.message}, status=status.HTTP_403_FORBIDDEN)
+            except ledger.LedgerError as e:
+                return Response({'message': e.message}, status=status.HTTP_400_BAD_REQUEST)
 
-            return Response({'balance': account.balance}, status=status.HTTP_200_OK)
+            cache.invalidate(cache.account_key(pk))
+            return Response({'balance': balance}, status=status.HTTP_200_OK)
 
         # Retorna erros de validação se o serializer não for válido
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
-    
-    def save_in_tranfer(self, sender, receiver, value):
-        # Salva informações de transferência usando um serializador específico
-        transfer_serializer = serializers.CreateTransferDetailSerializer(
-            data={
-                "sender": sender,
-                "receiver": receiver,
-                "value": value,
-                "description": ""
-            }
-        )
-        transfer_serializer.is_valid(raise_exception=True)
-        transfer_serializer.save()
+
+    @action(methods=['GET'], detail=True, url_path='summary')
+    def summary(self, request, pk=None):
+        # Entradas, saídas e saldo em aberto de empréstimos e créditos, calculados no banco.
+        # ?start=AAAA-MM-DD&end=AAAA-MM-DD limita as transferências; ?bucket=day|month agrupa
+        try:
+            start, end = exports.parse_period(request.query_params)
+        except ValueError as e:
+            return Response({str(e): 'data inválida, use AAAA-MM-DD'}, status=status.HTTP_400_BAD_REQUEST)
+
+        bucket = request.query_params.get('bucket')
+        if bucket is not None and bucket not in summaries.BUCKETS:
+            return Response({'bucket': f'use um de: {", ".join(summaries.BUCKETS)}'}, status=status.HTTP_400_BAD_REQUEST)
+
+        data = summaries.account_summary(pk, request.user, start, end, bucket)
+        if data is None:
+            return Response({'message': 'conta não encontrada'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(data, status=status.HTTP_200_OK)
+
+    @action(methods=['GET'], detail=True, url_path='reconcile')
+    def reconcile(self, request, pk=None):
+        # Confere o saldo da conta com o último snapshot + transferências posteriores
+        account = self.get_object()
+        return Response(snapshots.reconcile(account), status=status.HTTP_200_OK)
     
 
 # Definição de uma viewset para manipulação de transferências
-class TansferViewSet(viewsets.GenericViewSet):
+class TansferViewSet(ReplicaReadMixin, viewsets.GenericViewSet):
     queryset = models.Transfer.objects.all()
+    permission_classes = [IsAuthenticated]
 
     def get_serializer_class(self):
         # Escolhe o serializador com base na ação (retrieve, create, etc.)
@@ -134,71 +200,118 @@ class TansferViewSet(viewsets.GenericViewSet):
         # Obtém o usuário da requisição
         return self.request.user
     
-    def verify_account_balance(self, account_id, value):
-        # Verifica se o saldo da conta é suficiente para a operação
-        if value <= 0 or models.Account.objects.get(id=account_id).balance < value:
-            return False
-        return True
-
+    @idempotent
     def create(self, request):
         # Criação de uma nova transferência
         sender = request.data.get("sender")
         receiver = request.data.get("receiver")
-        value = round(decimal.Decimal(request.data.get("value")), 2)
-        description = request.data.get("description")
-
-        if value < 0:
-            # Retorna um erro se o valor da transferência for inválido
-            return Response({'message': 'valor de transferencia invalido'}, status=status.HTTP_403_FORBIDDEN)
-        elif models.Account.objects.get(id=sender).balance < value:
-            # Retorna um erro se o saldo for insuficiente
-            return Response({'message': 'No balance enough'}, status=status.HTTP_403_FORBIDDEN)
-        else:
-            # Verifica se a conta de envio pertence ao usuário autenticado
-            if models.Account.objects.get(id=sender).user.id == request.user.id:
-                # Cria a transferência e atualiza os saldos das contas
-                transfer_serializer = serializers.TransferSerializer(
-                    data={
-                        "sender": sender,
-                        "receiver": receiver,
-                        "value": value,
-                        "description": description
-                    }
-                )
-                transfer_serializer.is_valid(raise_exception=True)
-                transfer_serializer.save()
-
-                accound_sender = models.Account.objects.get(id=sender)
-                accound_sender.balance -= value
-                accound_sender.save()
 
-                accound_receiver = models.Account.objects.get(id=receiver)
-                accound_receiver.balance += value
-                accound_receiver.save()
-
-                return Response({'message': 'Transferido'}, status=status.HTTP_200_OK)
-            else:
-                # Retorna um erro se a conta de envio não pertencer ao usuário autenticado
-                return Response({'message': 'Esta conta não é do usuário logado'}, status=status.HTTP_403_FORBIDDEN)
+        if sender is None or receiver is None:
+            return Response({'message': 'sender e receiver são obrigatórios'}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Debita, credita e registra a transferência em uma única transação,
+        # exigindo que a conta de envio pertença ao usuário autenticado
+        try:
+            ledger.transfer(
+                sender,
+                receiver,
+                request.data.get("value"),
+                description=request.data.get("description"),
+                user=request.user,
+            )
+        except ledger.AccountNotFound as e:
+            return Response({'message': e.message}, status=status.HTTP_404_NOT_FOUND)
+        except ledger.LedgerError as e:
+            return Response({'message': e.message}, status=status.HTTP_403_FORBIDDEN)
+
+        cache.invalidate(cache.account_key(sender), cache.account_key(receiver))
+        return Response({'message': 'Transferido'}, status=status.HTTP_200_OK)
+
+    @action(methods=['POST'], detail=False, url_path='batch')
+    @idempotent
+    def batch(self, request):
+        # Várias transferências de uma conta do usuário em uma única transação
+        serializer = serializers.BatchTransferSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        sender = serializer.validated_data['sender']
+        items = serializer.validated_data['transfers']
+
+        try:
+            results = ledger.transfer_batch(sender, items, user=request.user)
+        except ledger.AccountNotFound as e:
+            return Response({'message': e.message}, status=status.HTTP_404_NOT_FOUND)
+        except ledger.LedgerError as e:
+            return Response({'message': e.message}, status=status.HTTP_403_FORBIDDEN)
+
+        cache.invalidate(cache.account_key(sender), *[
+            cache.account_key(item.get('receiver')) for item, result in zip(items, results) if result['status'] == 'ok'
+        ])
+        return Response({'results': results}, status=status.HTTP_200_OK)
 
     @action(methods=['GET'], detail=True, url_path='statement')
     def statement(self, request, pk=None):
-        # Obtém o histórico de transferências de uma conta
-        queryset = models.Transfer.objects.filter(
-            Q(sender=pk) | Q(receiver=pk)
-        ).order_by('-created_at')
-        serializer = self.get_serializer(queryset, many=True)
-
-        return Response(serializer.data)
+        # Obtém o histórico de transferências de uma conta, paginado por cursor.
+        # Envio e recebimento são consultados separadamente para que cada
+        # metade use o seu índice (sender/receiver, created_at). Só o dono da conta vê o extrato
+        if not models.Account.objects.filter(pk=pk, user=request.user).exists():
+            return Response({'message': 'conta não encontrada'}, status=status.HTTP_404_NOT_FOUND)
+
+        base = models.Transfer.objects.select_related('sender__user', 'receiver__user')
+        paginator = KeysetPagination()
+        page = paginator.paginate_union([base.filter(sender=pk), base.filter(receiver=pk)], request)
+        serializer = serializers.TransferStatementSerializer(page, many=True)
+
+        return paginator.get_paginated_response(serializer.data)
+
+    def export(self, request, pk=None, fmt=None):
+        # Exporta o extrato completo em CSV ou NDJSON, em streaming.
+        # A conta precisa ser do usuário, conferida antes de enviar qualquer linha
+        if not models.Account.objects.filter(pk=pk, user=request.user).exists():
+            return Response({'message': 'conta não encontrada'}, status=status.HTTP_404_NOT_FOUND)
+
+        try:
+            start, end = exports.parse_period(request.query_params)
+        except ValueError as e:
+            return Response({str(e): 'data inválida, use AAAA-MM-DD'}, status=status.HTTP_400_BAD_REQUEST)
+
+        content_type, stream = exports.FORMATS[fmt]
+        response = StreamingHttpResponse(
+            stream(exports.statement_rows(pk, start, end)),
+            content_type=content_type,
+        )
+        response['Content-Disposition'] = f'attachment; filename="statement-{pk}.{fmt}"'
+        return response
 
 
 # Definição de uma view para empréstimos
-class LoanViewSet(generics.ListCreateAPIView):
+class LoanViewSet(ReplicaReadMixin, generics.ListCreateAPIView):
     queryset = models.Loan.objects.all()
     serializer_class = serializers.LoanSerializer
-    authentication_classes = [authenticationJWT.JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAuthenticated]
+    pagination_class = LoanPagination
+
+    def include_installments(self):
+        return 'installments' in self.request.query_params.get('include', '').split(',')
+
+    def get_queryset(self):
+        # Só os empréstimos das contas do usuário autenticado
+        queryset = self.queryset.filter(account__user=self.request.user)
+        if self.include_installments():
+            # Uma query para as parcelas de todos os empréstimos da página
+            queryset = queryset.prefetch_related(Prefetch(
+                'loaninstallments_set', queryset=models.LoanInstallments.objects.order_by('due_date', 'id'),
+            ))
+        return queryset
+
+    def get_serializer_class(self):
+        if self.request.method != 'GET':
+            return serializers.LoanSerializer
+        if self.include_installments():
+            return serializers.LoanWithInstallmentsSerializer
+        return serializers.LoanListSerializer
 
+    @idempotent
     def create(self, request):
         # Criação de um novo empréstimo
         account = request.data.get("account")
@@ -215,47 +328,69 @@ class LoanViewSet(generics.ListCreateAPIView):
             # Retorna um erro se o número de parcelas for muito baixo
             return Response({'message': f'o número de parcelas precisa ser de pelo menos {min_installments}'})
         else:
-            # Registra o empréstimo e cria as parcelas correspondentes
+            # Valida os dados e registra o empréstimo, as parcelas e o crédito
+            # na conta em uma única transação
             loan_serializer = serializers.LoanSerializer(
                 data={
                     "value": value,
                     "installments": installments,
                     "account": account,
-                }
+                },
+                context=self.get_serializer_context(),
             )
             loan_serializer.is_valid(raise_exception=True)
-            loan_serializer.save()
-
-            last_loan = models.Loan.objects.latest('id')
-
-            for i in range(installments):
-                # Calcula o valor e a data de vencimento de cada parcela
-                installment_serializer = serializers.LoanInstallmentsSerializer(
-                    data={
-                        "value": round((value / installments * (last_loan.fees * i)), 2),
-                        "due_date": datetime.datetime.combine(datetime.date.today() +  relativedelta(months=+i), datetime.datetime.min.time()),
-                        "loanId": last_loan.pk,
-                        "payed_date": None
-                    }
-                )
-                installment_serializer.is_valid(raise_exception=True)
-                installment_serializer.save()
-
-            # Atualiza o saldo da conta do usuário
-            user = models.Account.objects.get(id=account)
-            user.balance += value
-            user.save()
+            loan = lending.create_loan(**loan_serializer.validated_data)
+            cache.invalidate(cache.account_key(loan.account_id))
 
             return Response({'message': 'Loan Received'}, status=status.HTTP_201_CREATED)
 
 
+# Simulação de empréstimo: calcula a tabela em memória, sem acessar o banco
+class LoanSimulationView(generics.GenericAPIView):
+    serializer_class = serializers.LoanSimulationSerializer
+    authentication_classes = [CachedJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        serializer = self.get_serializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+
+        # Sem taxa informada, usa a taxa padrão dos empréstimos (Loan.fees)
+        rate = params.get('rate')
+        if rate is None:
+            rate = amortization.rate_from_fees(models.Loan._meta.get_field('fees').default)
+
+        data = amortization.quote(params['value'], params['installments'], rate, params['system'])
+        if params['schedule']:
+            data['schedule'] = [row._asdict() for row in amortization.schedule(
+                params['value'], params['installments'], rate, params['system'],
+            )]
+        return Response(data, status=status.HTTP_200_OK)
+
+
 # Definição de uma view para compras a prazo (créditos)
-class CreditViewSet(generics.ListCreateAPIView):
+class CreditViewSet(ReplicaReadMixin, generics.ListCreateAPIView):
     queryset = models.Credit.objects.all()
     serializer_class = serializers.CreditSerializer
-    authentication_classes = [authenticationJWT.JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAuthenticated]
+    pagination_class = CreditPagination
 
+    def get_queryset(self):
+        # Créditos das contas do usuário (de uma só conta em credit/<pk>); a posse
+        # da conta é conferida na própria query da listagem
+        queryset = self.queryset.filter(account__user=self.request.user)
+        if self.kwargs.get('pk') is not None:
+            queryset = queryset.filter(account=self.kwargs['pk'])
+        return lending.with_open_installments(queryset)
+
+    def get_serializer_class(self):
+        if self.request.method == 'GET':
+            return serializers.CreditListSerializer
+        return serializers.CreditSerializer
+
+    @idempotent
     def create(self, request):
         # Criação de um novo crédito (compra a prazo)
         account = request.data.get("account")
@@ -272,38 +407,31 @@ class CreditViewSet(generics.ListCreateAPIView):
             # Retorna um erro se o número de parcelas for muito baixo
             return Response({'message': f'o número de parcelas precisa ser de pelo menos {min_installments}'})
         else:
-            # Registra o crédito e cria as parcelas correspondentes
+            # Valida os dados e registra o crédito e as parcelas em uma única transação
             credit_serializer = serializers.CreditSerializer(
                 data={
                     "account": account,
                     "installments": installments,
                     "value": value
-                }
+                },
+                context=self.get_serializer_context(),
             )
             credit_serializer.is_valid(raise_exception=True)
-            credit_serializer.save()
-
-            last_credit = models.Credit.objects.latest("id")
-
-            for i in range(installments):
-                # Calcula a data de vencimento de cada parcela
-                due_date = datetime.datetime.now() + relativedelta(months=+i)
-                due_date = datetime.datetime.combine(due_date, datetime.datetime.min.time())
-
-                installments_serializer = serializers.CreditInstallmentsSerializer(
-                    data={
-                        "creditId": last_credit.pk,
-                        "value": round((value / installments), 2),
-                        "due_date": due_date.replace(day=5)
-                    }
-                )
-                installments_serializer.is_valid(raise_exception=True)
-                installments_serializer.save()
+            credit = lending.create_credit(**credit_serializer.validated_data)
+            cache.invalidate(cache.credit_list_key(credit.account_id))
             return Response({'message': 'Credito criado'}, status=status.HTTP_201_CREATED)
 
     def list(self, request, pk=None):
-        # Lista os créditos de um determinado usuário
-        queryset = models.Credit.objects.filter(account=pk)
-        serializer = serializers.CreditSerializer(queryset, many=True)
-
-        return Response(serializer.data)
+        # Lista paginada dos créditos do usuário ou de uma conta dele; a primeira
+        # página de uma conta é servida do cache quando possível
+        def build():
+            page = self.paginate_queryset(self.get_queryset())
+            # Só com a página vazia é preciso saber se a conta existe e é do usuário
+            if not page and pk is not None and not models.Account.objects.filter(pk=pk, user=request.user).exists():
+                return Response({'message': 'conta não encontrada'}, status=status.HTTP_404_NOT_FOUND)
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+
+        if pk is None or request.query_params:
+            return build()
+        return cache.cached_response(request, cache.credit_list_key(pk), build)
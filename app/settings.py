@@ -2,6 +2,7 @@
 
 from pathlib import Path
 import datetime
+import os
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -42,6 +43,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.QueryProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -53,6 +55,18 @@ MIDDLEWARE = [
     'core.middleware.LoginAttemptsMiddleware',
 ]
 
+# Onde o LoginAttemptsMiddleware guarda as tentativas de login:
+# 'core.throttle.CacheThrottleStore' (cache do Django) ou
+# 'core.throttle.LocalThrottleStore' (LRU em memória, um único nó)
+LOGIN_THROTTLE_STORE = 'core.throttle.CacheThrottleStore'
+
+# Perfil por rota (core.middleware.QueryProfilingMiddleware): queries, tempo de
+# banco/serialização e header Server-Timing. Lido por `manage.py perfreport`
+PROFILING_ENABLED = False
+PROFILING_WINDOW = 1000
+PROFILING_FLUSH_EVERY = 100
+PROFILING_DIR = BASE_DIR / 'vol' / 'perf'
+
 ROOT_URLCONF = 'app.urls'
 
 TEMPLATES = [
@@ -77,13 +91,106 @@ WSGI_APPLICATION = 'app.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
-DATABASES = {
+# Configurado por variáveis de ambiente. Sem nenhuma, usa o SQLite local.
+#   FASTBANK_DB_ENGINE       sqlite (padrão) | postgresql (requer psycopg2 ou psycopg)
+#   FASTBANK_DB_NAME/USER/PASSWORD/HOST/PORT
+#   FASTBANK_DB_CONN_MAX_AGE segundos que a conexão é reaproveitada entre requisições
+#                            (0 = reconecta a cada requisição; vazio = para sempre)
+#   FASTBANK_DB_POOL         pgbouncer: conexões passam por um PgBouncer em modo
+#                            transação (desliga cursores do lado do servidor)
+#   FASTBANK_SQLITE_BUSY_TIMEOUT  espera por lock de escrita em ms (padrão 5000)
+#   FASTBANK_SQLITE_WAL      1 = journal em WAL (ver SQLITE_PRAGMAS)
+
+def _env_int(name, default):
+    value = os.environ.get(name)
+    return default if value is None else int(value)
+
+
+DB_ENGINE = os.environ.get('FASTBANK_DB_ENGINE', 'sqlite')
+DB_POOL = os.environ.get('FASTBANK_DB_POOL', '')
+
+if DB_ENGINE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('FASTBANK_DB_NAME', 'fastbank'),
+            'USER': os.environ.get('FASTBANK_DB_USER', 'fastbank'),
+            'PASSWORD': os.environ.get('FASTBANK_DB_PASSWORD', ''),
+            'HOST': os.environ.get('FASTBANK_DB_HOST', 'localhost'),
+            'PORT': os.environ.get('FASTBANK_DB_PORT', '6432' if DB_POOL == 'pgbouncer' else '5432'),
+        }
+    }
+    if DB_POOL == 'pgbouncer':
+        # Em modo transação o PgBouncer troca a conexão do servidor entre
+        # transações, então cursores nomeados não podem ser usados
+        DATABASES['default']['DISABLE_SERVER_SIDE_CURSORS'] = True
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('FASTBANK_DB_NAME', BASE_DIR / 'db.sqlite3'),
+            # Espera do driver por um lock de escrita (segundos)
+            'OPTIONS': {'timeout': _env_int('FASTBANK_SQLITE_BUSY_TIMEOUT', 5000) / 1000},
+        }
+    }
+
+_conn_max_age = os.environ.get('FASTBANK_DB_CONN_MAX_AGE', '60')
+DATABASES['default']['CONN_MAX_AGE'] = int(_conn_max_age) if _conn_max_age else None
+# Testa a conexão reaproveitada antes do primeiro uso em cada requisição
+DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+
+# PRAGMAs aplicados a cada nova conexão SQLite (core.apps). Em um único
+# servidor, FASTBANK_SQLITE_WAL=1 liga o WAL (leituras concorrentes com uma
+# escrita); o modo fica gravado no arquivo, por isso não é o padrão local
+SQLITE_PRAGMAS = {'busy_timeout': _env_int('FASTBANK_SQLITE_BUSY_TIMEOUT', 5000)}
+if _env_int('FASTBANK_SQLITE_WAL', 0):
+    SQLITE_PRAGMAS.update(journal_mode='WAL', synchronous='NORMAL')
+
+# Réplicas de leitura, separadas por vírgula: caminhos de cópias do banco
+# em SQLite (FASTBANK_READ_REPLICAS=/tmp/replica1.sqlite3) ou host[:porta]
+# em Postgres. Cada uma vira o alias `replicaN` com as mesmas configurações
+# do primário; nos testes e benchmarks elas espelham o `default`.
+READ_REPLICAS = []
+for _i, _replica in enumerate(filter(None, os.environ.get('FASTBANK_READ_REPLICAS', '').split(',')), start=1):
+    _replica = _replica.strip()
+    if DB_ENGINE == 'postgresql':
+        _host, _, _port = _replica.partition(':')
+        _replica = {'HOST': _host, 'PORT': _port or DATABASES['default']['PORT']}
+    else:
+        _replica = {'NAME': _replica}
+    DATABASES[f'replica{_i}'] = {**DATABASES['default'], **_replica, 'TEST': {'MIRROR': 'default'}}
+    READ_REPLICAS.append(f'replica{_i}')
+
+DATABASE_ROUTERS = ['core.routers.PrimaryReplicaRouter']
+
+# Depois de escrever, o usuário lê do primário por este tempo (core.routers)
+REPLICA_STICKY_SECONDS = 5
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# Memória local por processo; em produção, aponte para Redis/Memcached
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
     }
 }
 
+# Cache das respostas de contas e créditos (api.cache)
+API_CACHE_ALIAS = 'default'
+API_CACHE_TIMEOUT = 300
+
+# Quantos números de conta cada processo reserva por vez (core.numbering)
+ACCOUNT_NUMBER_BLOCK_SIZE = 100
+
+# Máximo de itens aceitos em POST /api/v1/transfer/batch/
+TRANSFER_BATCH_MAX_ITEMS = 500
+
+# `manage.py compact_ledger` só incorpora lançamentos criados há mais de
+# tantos segundos, para não pular os de transações ainda não confirmadas
+LEDGER_COMPACTION_LAG = 60
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -127,6 +234,15 @@ MEDIA_URL = 'static/media/'
 MEDIA_ROOT = 'vol/web/media/'
 MEDIA_ROOT = 'vol/web/static/'
 
+# Miniaturas das imagens de perfil (core.images): lados em pixels, formatos
+# e threads do pool que as gera fora da requisição
+USER_THUMBNAIL_SIZES = (64, 256)
+USER_THUMBNAIL_FORMATS = ('webp', 'jpeg')
+IMAGE_WORKERS = 2
+
+# Tamanho máximo da imagem de perfil enviada (user.uploads), em bytes
+USER_IMAGE_MAX_SIZE = 5 * 1024 * 1024
+
 
 
 # Default primary key field type
@@ -147,10 +263,24 @@ REST_FRAMEWORK = {
     ),
 
     'DEFAULT_AUTHENTICATION_CLASSES':(
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'core.authentication.CachedJWTAuthentication',
     )
 }
 
+# Cache do principal autenticado (core.authentication): store com a mesma
+# interface dos stores de tentativas de login e validade em segundos. Fica
+# no cache do Django para que o bloqueio ou a desativação de um usuário
+# invalide o principal em todos os processos. O LRU local
+# (core.throttle.LocalThrottleStore) só serve para um único nó: nos demais
+# processos o usuário bloqueado seria aceito até a TTL vencer
+AUTH_USER_CACHE_STORE = 'core.throttle.CacheThrottleStore'
+AUTH_USER_CACHE_TTL = 60
+
+# Idempotency-Key (core.idempotency): validade das chaves em segundos e o
+# LRU em memória que responde às repetições sem consultar o banco
+IDEMPOTENCY_KEY_TTL = 24 * 3600
+IDEMPOTENCY_STORE = 'core.throttle.LocalThrottleStore'
+
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': datetime.timedelta(minutes=60),
     'REFRESH_TOKEN_LIFETIME': datetime.timedelta(days=30),
@@ -0,0 +1,96 @@
+""" Tabelas de amortização (Price e SAC)
+
+As parcelas são calculadas em forma fechada sobre o vetor de índices
+(sem laço saldo a saldo) com Decimal, e o arredondamento para centavos é
+corrigido na última parcela para que a soma das amortizações seja
+exatamente o valor financiado. As tabelas são imutáveis e ficam em cache
+por (valor, parcelas, taxa, sistema).
+"""
+import decimal
+import functools
+import itertools
+from collections import namedtuple
+
+CENTS = decimal.Decimal('0.01')
+SYSTEMS = ('price', 'sac')
+
+Installment = namedtuple('Installment', ['number', 'payment', 'interest', 'amortization', 'balance'])
+
+
+def _cents(value):
+    return value.quantize(CENTS, decimal.ROUND_HALF_EVEN)
+
+
+def rate_from_fees(fees):
+    """`Loan.fees` é um multiplicador (1.025 = 2,5% ao mês); retorna a taxa mensal"""
+    return decimal.Decimal(str(fees)) - 1
+
+
+def _table(value, amortizations, interests):
+    # Ajusta o resíduo de arredondamento na última parcela e monta as linhas
+    amortizations[-1] += value - sum(amortizations)
+    balances = [value - paid for paid in itertools.accumulate(amortizations)]
+    return tuple(
+        Installment(number, amortization + interest, interest, amortization, balance)
+        for number, (amortization, interest, balance)
+        in enumerate(zip(amortizations, interests, balances), start=1)
+    )
+
+
+def _price(value, installments, rate):
+    # Parcela constante: PMT = P * r / (1 - (1 + r)^-n)
+    if rate == 0:
+        payment = _cents(value / installments)
+        return _table(value, [payment] * installments, [decimal.Decimal('0.00')] * installments)
+
+    factor = (1 + rate) ** installments
+    payment = _cents(value * rate * factor / (factor - 1))
+
+    # A amortização cresce geometricamente: A_k = (PMT - P * r) * (1 + r)^(k - 1)
+    growth = itertools.accumulate(itertools.repeat(1 + rate, installments - 1), lambda a, b: a * b, initial=1)
+    first = payment - value * rate
+    amortizations = [_cents(first * g) for g in growth]
+    interests = [payment - amortization for amortization in amortizations]
+    return _table(value, amortizations, interests)
+
+
+def _sac(value, installments, rate):
+    # Amortização constante; os juros incidem sobre o saldo devedor de cada mês
+    amortization = _cents(value / installments)
+    interests = [_cents((value - amortization * k) * rate) for k in range(installments)]
+    return _table(value, [amortization] * installments, interests)
+
+
+@functools.lru_cache(maxsize=4096)
+def _schedule(value, installments, rate, system):
+    return (_price if system == 'price' else _sac)(value, installments, rate)
+
+
+def schedule(value, installments, rate, system='price'):
+    """Tabela completa (tupla de Installment) para o financiamento"""
+    if system not in SYSTEMS:
+        raise ValueError(f'sistema de amortização inválido: {system}')
+    if installments < 1:
+        raise ValueError('o número de parcelas precisa ser pelo menos 1')
+
+    # Normaliza a chave do cache (ex.: 1000 e 1000.00 são o mesmo financiamento)
+    value = _cents(decimal.Decimal(value))
+    rate = decimal.Decimal(rate).normalize()
+    return _schedule(value, int(installments), rate, system)
+
+
+def quote(value, installments, rate, system='price'):
+    """Resumo do financiamento, sem a tabela"""
+    table = schedule(value, installments, rate, system)
+    total = sum(row.payment for row in table)
+    principal = _cents(decimal.Decimal(value))
+    return {
+        'value': principal,
+        'installments': len(table),
+        'rate': decimal.Decimal(rate),
+        'system': system,
+        'first_payment': table[0].payment,
+        'last_payment': table[-1].payment,
+        'total': total,
+        'interest': total - principal,
+    }
@@ -0,0 +1,110 @@
+""" Autenticação JWT sem consulta ao banco na maioria das requisições
+
+O `JWTAuthentication` do simplejwt busca o usuário inteiro a cada
+requisição. Aqui só o principal mínimo (id, is_active e o estado de
+bloqueio) é lido, e ele fica em cache por `AUTH_USER_CACHE_TTL` segundos
+no store de `AUTH_USER_CACHE_STORE` (o cache do Django por padrão,
+compartilhado entre os processos). O usuário da
+requisição é montado a partir do cache com os demais campos adiados:
+quem precisar deles (ex.: /user/me) deve buscar o registro completo.
+
+O cache é invalidado quando o usuário é alterado pelo UserSerializer e
+quando a conta é bloqueada ou desbloqueada no login.
+"""
+import threading
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from core.models import User
+
+PRINCIPAL_FIELDS = ('id', 'is_active', 'locked_at', 'unlocked_at')
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            path = getattr(settings, 'AUTH_USER_CACHE_STORE', 'core.throttle.CacheThrottleStore')
+            _store = import_string(path)()
+        return _store
+
+
+def _key(user_id):
+    return f"principal:{user_id}"
+
+
+def invalidate_user(user_id):
+    """Remove o principal do cache; a próxima requisição relê do banco"""
+    get_store().delete(_key(user_id))
+
+
+def _fields():
+    # Com CHECK_REVOKE_TOKEN o hash da senha também precisa estar no principal.
+    # Na ordem dos campos do modelo, que é a esperada por Model.from_db()
+    wanted = PRINCIPAL_FIELDS + (('password',) if api_settings.CHECK_REVOKE_TOKEN else ())
+    return tuple(f.attname for f in User._meta.concrete_fields if f.attname in wanted)
+
+
+def is_locked(user, now=None):
+    now = now or timezone.now()
+    return user.locked_at is not None and user.unlocked_at is not None and now < user.unlocked_at
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    def _user_id(self, validated_token):
+        try:
+            return validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+    def _principal_queryset(self, user_id):
+        return User.objects.filter(**{api_settings.USER_ID_FIELD: user_id}).values_list(*_fields())
+
+    def _remember(self, user_id, values):
+        if values is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+        get_store().set(_key(user_id), values, getattr(settings, 'AUTH_USER_CACHE_TTL', 60))
+
+    def _build(self, values, validated_token):
+        # Instância nova a cada requisição; os campos fora do principal ficam adiados
+        user = User.from_db(DEFAULT_DB_ALIAS, _fields(), values)
+
+        if not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if is_locked(user):
+            raise AuthenticationFailed('Sua conta foi bloqueada. Tente novamente mais tarde', code="user_locked")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+
+        return user
+
+    def get_user(self, validated_token):
+        user_id = self._user_id(validated_token)
+        values = get_store().get(_key(user_id))
+        if values is None:
+            values = self._principal_queryset(user_id).first()
+            self._remember(user_id, values)
+        return self._build(values, validated_token)
+
+    async def aget_user(self, validated_token):
+        """Versão para as views assíncronas (api.async_views)"""
+        user_id = self._user_id(validated_token)
+        values = get_store().get(_key(user_id))
+        if values is None:
+            values = await self._principal_queryset(user_id).afirst()
+            self._remember(user_id, values)
+        return self._build(values, validated_token)
@@ -0,0 +1,59 @@
+""" Utilitários compartilhados pelos comandos de benchmark (bench_*)
+"""
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+
+from django.db import connections
+
+from core.profiling import percentiles  # noqa: F401 (reexportado para os comandos bench_*)
+
+
+@contextmanager
+def bench_database(alias='default', verbosity=0):
+    """Cria um banco de teste descartável e o remove ao final.
+
+    Em SQLite o banco de teste padrão é em memória, o que não permite
+    várias threads com conexões próprias; por isso usamos um arquivo
+    temporário.
+    """
+    connection = connections[alias]
+    tmpdir = None
+
+    if connection.vendor == 'sqlite':
+        tmpdir = tempfile.mkdtemp(prefix='fastbank-bench-')
+        connection.settings_dict.setdefault('TEST', {})['NAME'] = os.path.join(tmpdir, 'bench.sqlite3')
+
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=verbosity, autoclobber=True, serialize=False)
+
+    # Réplicas que espelham este banco passam a ler o banco de teste
+    mirrors = {
+        other.alias: other.settings_dict['NAME'] for other in connections.all()
+        if other.settings_dict.get('TEST', {}).get('MIRROR') == alias
+    }
+    for mirror in mirrors:
+        connections[mirror].close()
+        connections[mirror].settings_dict['NAME'] = connection.settings_dict['NAME']
+    try:
+        yield connection
+    finally:
+        connections.close_all()
+        for mirror, name in mirrors.items():
+            connections[mirror].settings_dict['NAME'] = name
+        connection.creation.destroy_test_db(old_name, verbosity=verbosity)
+        if tmpdir:
+            for name in os.listdir(tmpdir):
+                os.remove(os.path.join(tmpdir, name))
+            os.rmdir(tmpdir)
+
+
+class Timer:
+    # Cronômetro simples usado como context manager
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.start
@@ -0,0 +1,204 @@
+""" Gerador de dados sintéticos em volume (usado por `manage.py seedbank`)
+
+Tudo é gravado com bulk_create em blocos. Cada bloco tem o seu próprio
+gerador aleatório, derivado da semente e do índice do bloco, então o
+conteúdo gerado é o mesmo qualquer que seja o número de workers. Os
+blocos de transferências, empréstimos e créditos podem ser distribuídos
+entre processos (cada um com a sua conexão).
+"""
+import datetime
+import decimal
+import random
+
+from django.contrib.auth.hashers import make_password
+from django.db import connections, transaction
+from django.db.models import DecimalField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from cpf_field.validators import digit_generator
+
+from core import lending, numbering
+from core.models import (
+    Account, Credit, CreditInstallments, Loan, LoanInstallments, Transfer, User,
+)
+
+INITIAL_DEPOSIT = decimal.Decimal('100000.00')
+
+# Preenchido no processo pai antes do fork; os workers herdam a lista
+_ACCOUNT_IDS = []
+
+
+def chunk_rng(seed, kind, index):
+    # Gerador determinístico e independente por bloco
+    return random.Random(f'{seed}:{kind}:{index}')
+
+
+def make_cpf(rng):
+    """CPF válido (11 dígitos, com dígitos verificadores corretos)"""
+    while True:
+        base = ''.join(str(rng.randrange(10)) for _ in range(9))
+        if len(set(base)) > 1:
+            break
+    first = digit_generator(base, weight=10)
+    second = digit_generator(f'{base}{first}', weight=11)
+    return f'{base}{first}{second}'
+
+
+def random_moment(rng, options):
+    # Data aleatória dentro da janela [start_date, start_date + days)
+    start = timezone.make_aware(datetime.datetime.combine(options['start_date'], datetime.time.min))
+    return start + datetime.timedelta(seconds=rng.randrange(options['days'] * 86400))
+
+
+def random_value(rng, low, high):
+    return decimal.Decimal(rng.randrange(low * 100, high * 100)) / 100
+
+
+def seed_users(index, count, options, password_hash):
+    """Cria `count` usuários, uma ou mais contas para cada e o depósito inicial; retorna os ids das contas"""
+    rng = chunk_rng(options['seed'], 'users', index)
+    first = index * options['batch_size']
+    created_at = timezone.now() - datetime.timedelta(days=1)
+
+    numbers = iter(numbering.allocator.allocate_many('0001', count * options['accounts_per_user']))
+
+    with transaction.atomic():
+        users = User.objects.bulk_create([
+            User(
+                email=f"{options['prefix']}{first + i}@fastbank.com",
+                password=password_hash,
+                first_name='Seed',
+                last_name=str(first + i),
+                cpf=make_cpf(rng),
+                created_at=created_at,
+            )
+            for i in range(count)
+        ])
+        accounts = Account.objects.bulk_create([
+            Account(
+                user_id=user.pk,
+                agency='0001',
+                number=next(numbers),
+                nickname=f'seed {n}',
+                balance=INITIAL_DEPOSIT,
+                created_at=random_moment(rng, options),
+            )
+            for user in users
+            for n in range(options['accounts_per_user'])
+        ])
+        Transfer.objects.bulk_create([
+            Transfer(sender=None, receiver_id=account.pk, value=INITIAL_DEPOSIT,
+                     description='', created_at=account.created_at)
+            for account in accounts
+        ])
+    return [account.pk for account in accounts]
+
+
+def seed_transfers(index, count, options):
+    rng = chunk_rng(options['seed'], 'transfers', index)
+    rows = []
+    for _ in range(count):
+        sender, receiver = rng.sample(_ACCOUNT_IDS, 2)
+        rows.append(Transfer(
+            sender_id=sender,
+            receiver_id=receiver,
+            value=random_value(rng, 1, 50),
+            description='seed',
+            created_at=random_moment(rng, options),
+        ))
+    Transfer.objects.bulk_create(rows)
+    return count
+
+
+def seed_loans(index, count, options):
+    rng = chunk_rng(options['seed'], 'loans', index)
+    with transaction.atomic():
+        loans = Loan.objects.bulk_create([
+            Loan(
+                account_id=rng.choice(_ACCOUNT_IDS),
+                installments=rng.randint(2, options['max_installments']),
+                value=random_value(rng, 1001, 20000),
+                request_date=random_moment(rng, options),
+            )
+            for _ in range(count)
+        ])
+        LoanInstallments.objects.bulk_create([
+            LoanInstallments(loanId_id=loan.pk, due_date=due, value=amount, payed_date=None)
+            for loan in loans
+            for due, amount in lending.loan_schedule(
+                loan.value, loan.installments, loan.fees, start=loan.request_date.date(),
+            )
+        ])
+        # O valor liberado entra como depósito, como em lending.create_loan
+        Transfer.objects.bulk_create([
+            Transfer(sender=None, receiver_id=loan.account_id, value=loan.value,
+                     description=f'Empréstimo {loan.pk}', created_at=loan.request_date)
+            for loan in loans
+        ])
+    return count
+
+
+def seed_credits(index, count, options):
+    rng = chunk_rng(options['seed'], 'credits', index)
+    with transaction.atomic():
+        credits = Credit.objects.bulk_create([
+            Credit(
+                account_id=rng.choice(_ACCOUNT_IDS),
+                installments=rng.randint(2, options['max_installments']),
+                value=random_value(rng, 10, 1000),
+                date=random_moment(rng, options),
+            )
+            for _ in range(count)
+        ])
+        CreditInstallments.objects.bulk_create([
+            CreditInstallments(creditId_id=credit.pk, due_date=due, value=amount)
+            for credit in credits
+            for due, amount in lending.credit_schedule(credit.value, credit.installments, start=credit.date.date())
+        ])
+    return count
+
+
+TASKS = {
+    'transfers': seed_transfers,
+    'loans': seed_loans,
+    'credits': seed_credits,
+}
+
+
+def run_task(task):
+    kind, index, count, options = task
+    return kind, TASKS[kind](index, count, options)
+
+
+def init_worker():
+    # Cada processo abre a sua própria conexão na primeira query
+    connections.close_all()
+
+
+def chunks(total, size):
+    # (índice, quantidade) de cada bloco de `size` itens
+    return [(i, min(size, total - i * size)) for i in range((total + size - 1) // size)]
+
+
+def recompute_balances(first_account_id):
+    """Recalcula, em um único UPDATE, o saldo das contas geradas a partir das transferências"""
+    decimal_field = DecimalField(max_digits=10, decimal_places=2)
+
+    def total(side):
+        return Coalesce(
+            Subquery(
+                Transfer.objects.filter(**{side: OuterRef('pk')})
+                .values(side).annotate(total=Sum('value')).values('total')
+            ),
+            Value(decimal.Decimal('0.00')),
+            output_field=decimal_field,
+        )
+
+    return Account.objects.filter(id__gte=first_account_id).update(
+        balance=total('receiver') - total('sender'),
+    )
+
+
+def hashed_password(password):
+    # Um único hash reaproveitado por todos os usuários gerados
+    return make_password(password)
@@ -0,0 +1,162 @@
+""" Suíte de benchmark reprodutível da API Fastbank
+
+Popula um banco descartável com usuários, contas e transferências e então
+chama as rotas reais em processo (APIClient com JWT de verdade), medindo
+vazão, latência e queries por rota. O resultado é um dict serializável em
+JSON, para que execuções em commits diferentes possam ser comparadas.
+"""
+import datetime
+import platform
+import random
+import subprocess
+import time
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from core import ledger, profiling
+from core.bench import percentiles
+from core.models import Account, User
+
+PASSWORD = 'bench-password'
+
+
+def seed(users, transfers, rng):
+    """Cria `users` usuários com uma conta cada e `transfers` transferências entre elas"""
+    accounts = []
+    for i in range(users):
+        user = User.objects.create_user(
+            f'bench{i}@fastbank.com', PASSWORD,
+            first_name='Bench', last_name=str(i), cpf='52998224725',
+        )
+        accounts.append(Account.objects.create(
+            user=user, agency='0001', number=str(i).zfill(16), nickname=f'bench {i}',
+        ))
+
+    # O LoginAttemptsMiddleware recusa login de contas criadas há menos de 3 minutos
+    User.objects.update(created_at=timezone.now() - datetime.timedelta(days=1))
+
+    for account in accounts:
+        ledger.deposit(account.id, '100000.00')
+
+    # Histórico para o extrato, aplicado em lotes pelo motor de transferências
+    per_sender = {}
+    for _ in range(transfers):
+        sender, receiver = rng.sample(accounts, 2) if len(accounts) > 1 else (accounts[0], accounts[0])
+        per_sender.setdefault(sender, []).append({'receiver': receiver.id, 'value': '1.00', 'description': 'seed'})
+    for sender, items in per_sender.items():
+        for start in range(0, len(items), 500):
+            ledger.transfer_batch(sender.id, items[start:start + 500], user=sender.user)
+
+    return accounts
+
+
+def scenarios(accounts, rng):
+    """Rotas medidas: nome -> função que recebe a conta e devolve (método, url, corpo)"""
+    def other(account):
+        return rng.choice([a for a in accounts if a.id != account.id] or accounts)
+
+    return {
+        'token': lambda account: ('post', '/api/token/', {'email': account.user.email, 'password': PASSWORD}),
+        'account_create': lambda account: ('post', '/api/v1/accounts/', {'nickname': 'bench'}),
+        'deposit': lambda account: ('post', f'/api/v1/accounts/{account.id}/deposit/', {'value': '10.00'}),
+        'withdraw': lambda account: ('post', f'/api/v1/accounts/{account.id}/withdraw/', {'value': '1.00'}),
+        'transfer': lambda account: ('post', '/api/v1/transfer/', {
+            'sender': account.id, 'receiver': other(account).id, 'value': '1.00', 'description': 'bench',
+        }),
+        'statement': lambda account: ('get', f'/api/v1/transfer/{account.id}/statement/', None),
+        'loan': lambda account: ('post', '/api/v1/loan/', {'account': account.id, 'value': '5000.00', 'installments': 12}),
+        'credit': lambda account: ('post', '/api/v1/credit/', {'account': account.id, 'value': '500.00', 'installments': 6}),
+    }
+
+
+def measure(client, method, url, data):
+    # Executa uma requisição contando queries em todas as conexões
+    for connection in connections.all():
+        profiling.install_query_timer(connection)
+    profile, token = profiling.start()
+    begin = time.perf_counter()
+    try:
+        response = getattr(client, method)(url, data, format='json')
+    finally:
+        profiling.stop(token)
+    return time.perf_counter() - begin, profile.queries, response.status_code
+
+
+def run(users=10, transfers=1000, iterations=50, only=None, seed_value=42):
+    """Roda a suíte no banco atual (use dentro de core.bench.bench_database)"""
+    rng = random.Random(seed_value)
+    begin = time.perf_counter()
+    accounts = seed(users, transfers, rng)
+    seed_time = time.perf_counter() - begin
+
+    clients = {}
+    for account in accounts:
+        client = APIClient()
+        response = client.post('/api/token/', {'email': account.user.email, 'password': PASSWORD}, format='json')
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.json()['access']}")
+        clients[account.id] = client
+
+    results = {}
+    for name, build in scenarios(accounts, rng).items():
+        if only and name not in only:
+            continue
+
+        latencies, queries, errors = [], [], 0
+        begin = time.perf_counter()
+        for i in range(iterations):
+            account = accounts[i % len(accounts)]
+            elapsed, count, status_code = measure(clients[account.id], *build(account))
+            latencies.append(elapsed)
+            queries.append(count)
+            errors += status_code >= 400
+        wall = time.perf_counter() - begin
+
+        results[name] = {
+            'requests': iterations,
+            'errors': errors,
+            'rps': iterations / wall if wall else 0.0,
+            **percentiles(latencies),
+            'queries_avg': sum(queries) / len(queries),
+            'queries_max': max(queries),
+        }
+
+    return {
+        'meta': {
+            'commit': git_commit(),
+            'vendor': connections['default'].vendor,
+            'python': platform.python_version(),
+            'timestamp': timezone.now().isoformat(),
+            'seed_seconds': seed_time,
+            'options': {'users': users, 'transfers': transfers, 'iterations': iterations, 'seed': seed_value},
+        },
+        'endpoints': results,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(old, new):
+    """Diferenças por rota entre dois resultados (valores positivos = piorou)"""
+    diff = {}
+    for name, current in new['endpoints'].items():
+        previous = old['endpoints'].get(name)
+        if previous is None:
+            continue
+        diff[name] = {
+            'p50_ms': current['p50'] - previous['p50'],
+            'p99_ms': current['p99'] - previous['p99'],
+            'queries_avg': current['queries_avg'] - previous['queries_avg'],
+            'rps_pct': (current['rps'] / previous['rps'] - 1) * 100 if previous['rps'] else 0.0,
+        }
+    return diff
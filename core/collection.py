@@ -0,0 +1,128 @@
+""" Cobrança em lote das parcelas vencidas de empréstimos e créditos
+
+As parcelas em aberto são lidas em blocos pelo índice parcial
+(due_date, id) WHERE payed_date IS NULL, em paginação por chave. Cada bloco
+roda em uma transação: os débitos de todas as contas do bloco são gravados
+de uma vez pelo ledger (bulk_create das transferências e dos lançamentos),
+um UPDATE marca as parcelas pagas e outro quita os contratos sem parcelas
+em aberto. O número de queries por bloco é constante e a memória é limitada
+ao tamanho do bloco. Como cada bloco é confirmado separadamente e só
+parcelas em aberto são lidas, o job pode ser interrompido e executado de
+novo sem cobrar nada duas vezes. Execuções simultâneas também não: depois de
+travar as contas, o bloco relê quais parcelas continuam em aberto e o UPDATE
+só marca parcelas ainda não pagas; se o número de linhas não bater, o
+bloco inteiro é desfeito.
+"""
+from collections import namedtuple
+
+from django.db import connection, transaction
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+
+from core import ledger, signals
+from core.models import Account, Credit, CreditInstallments, Loan, LoanInstallments
+
+Kind = namedtuple('Kind', ['installments', 'parent', 'field', 'label'])
+
+KINDS = {
+    'loan': Kind(LoanInstallments, Loan, 'loanId', 'empréstimo'),
+    'credit': Kind(CreditInstallments, Credit, 'creditId', 'crédito'),
+}
+
+ChunkResult = namedtuple('ChunkResult', ['kind', 'paid', 'skipped', 'total', 'accounts', 'settled'])
+
+
+class AlreadyCollected(Exception):
+    """Parcela do bloco paga por uma execução concorrente"""
+
+
+def _open_installments(kind, until, chunk_size, after=None):
+    # Próximo bloco de parcelas em aberto vencidas até `until`, na ordem do índice
+    queryset = kind.installments.objects.filter(payed_date__isnull=True, due_date__lte=until)
+    if after is not None:
+        due_date, pk = after
+        queryset = queryset.filter(Q(due_date__gt=due_date) | Q(due_date=due_date, id__gt=pk))
+    return list(
+        queryset.order_by('due_date', 'id')
+        .values_list('id', 'due_date', 'value', f'{kind.field}_id', f'{kind.field}__account_id')[:chunk_size]
+    )
+
+
+def _collect_chunk(name, kind, rows, now):
+    account_ids = sorted({row[4] for row in rows})
+
+    with transaction.atomic():
+        if connection.features.has_select_for_update:
+            # Trava as contas do bloco em ordem de id, como no ledger
+            list(Account.objects.select_for_update().filter(id__in=account_ids).order_by('id').values_list('id'))
+
+        # As parcelas foram lidas fora da transação; outra execução pode tê-las
+        # pago enquanto esta esperava a trava. Só as que continuam em aberto são cobradas
+        still_unpaid = kind.installments.objects.filter(id__in=[row[0] for row in rows], payed_date__isnull=True)
+        if connection.features.has_select_for_update:
+            still_unpaid = still_unpaid.select_for_update()
+        fresh = set(still_unpaid.values_list('id', flat=True))
+        balances = ledger.balances(account_ids)
+
+        # Paga por ordem de vencimento; a conta sem saldo para uma parcela
+        # não paga as seguintes neste bloco
+        debits, paid, blocked = {}, [], set()
+        for pk, _, value, parent_id, account_id in rows:
+            if pk not in fresh:
+                continue
+            if account_id in blocked or balances[account_id] < value:
+                blocked.add(account_id)
+                continue
+            balances[account_id] -= value
+            debits[account_id] = debits.get(account_id, 0) + value
+            paid.append((pk, value, parent_id, account_id))
+
+        if not paid:
+            return ChunkResult(name, 0, len(fresh), 0, [], 0)
+
+        # Sem SELECT FOR UPDATE um saque concorrente pode ter consumido o saldo
+        # lido acima; nesse caso o ledger recusa e o bloco fica para a próxima execução
+        ledger.debit_many(
+            [(account_id, value, parent_id) for _, value, parent_id, account_id in paid],
+            f'Parcela {kind.label}',
+        )
+        updated = kind.installments.objects.filter(
+            id__in=[pk for pk, _, _, _ in paid], payed_date__isnull=True,
+        ).update(payed_date=now)
+        if updated != len(paid):
+            # Alguma parcela foi paga por outra execução depois da releitura:
+            # desfaz o bloco inteiro, inclusive os débitos
+            raise AlreadyCollected()
+
+        # Quita os contratos do bloco que não têm mais parcelas em aberto
+        still_open = kind.installments.objects.filter(**{kind.field: OuterRef('pk')}, payed_date__isnull=True)
+        settled = kind.parent.objects.filter(
+            id__in={parent_id for _, _, parent_id, _ in paid}, payed=False,
+        ).filter(~Exists(still_open)).update(payed=True)
+
+    return ChunkResult(name, len(paid), len(fresh) - len(paid), sum(debits.values()), list(debits), settled)
+
+
+def collect(name='loan', until=None, chunk_size=1000):
+    """Cobra as parcelas vencidas até `until` (agora, por padrão).
+
+    Gerador que produz um ChunkResult por bloco processado.
+    """
+    kind = KINDS[name]
+    until = until or timezone.now()
+    now = timezone.now()
+
+    after = None
+    while True:
+        rows = _open_installments(kind, until, chunk_size, after)
+        if not rows:
+            return
+        # As parcelas não pagas continuam em aberto; o cursor evita relê-las nesta execução
+        after = rows[-1][1], rows[-1][0]
+        try:
+            result = _collect_chunk(name, kind, rows, now)
+        except (ledger.InsufficientBalance, AlreadyCollected):
+            result = ChunkResult(name, 0, len(rows), 0, [], 0)
+        if result.accounts:
+            signals.installments_collected.send(sender=collect, kind=name, accounts=result.accounts)
+        yield result
@@ -0,0 +1,169 @@
+""" Cabeçalho Idempotency-Key nas requisições que movimentam dinheiro
+
+Uma requisição repetida com o mesmo `Idempotency-Key` (por usuário, por
+até `IDEMPOTENCY_KEY_TTL` segundos) recebe a resposta guardada da primeira
+execução, sem executar a view de novo. A mesma chave com outro método,
+caminho ou corpo é recusada com 422.
+
+A chave é reservada com um INSERT no índice único (usuário, chave) na
+mesma transação que executa a view e grava a resposta. Uma repetição
+concorrente fica parada nesse índice até a primeira terminar e então
+encontra a resposta já gravada; se a primeira falhar (exceção ou 5xx),
+tudo é desfeito e a repetição executa normalmente.
+
+As respostas também ficam em um LRU em memória (`IDEMPOTENCY_STORE`), e
+as repetições que o encontram não fazem nenhuma query; as demais fazem
+uma única leitura da tabela. As chaves vencidas são removidas por
+`manage.py purge_idempotency_keys`.
+"""
+import functools
+import hashlib
+import json
+import threading
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+from core.models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = IdempotencyKey._meta.get_field('key').max_length
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            path = getattr(settings, 'IDEMPOTENCY_STORE', 'core.throttle.LocalThrottleStore')
+            _store = import_string(path)()
+        return _store
+
+
+def key_ttl():
+    return getattr(settings, 'IDEMPOTENCY_KEY_TTL', 24 * 3600)
+
+
+def _cache_key(user_id, key):
+    return f"idempotency:{user_id}:{key}"
+
+
+def _dump(data):
+    # Mesmo encoder do JSONRenderer do DRF (Decimal, datas, UUID...)
+    return json.dumps(data, cls=JSONEncoder, sort_keys=True)
+
+
+def fingerprint(request):
+    """sha256 do método, caminho e corpo da requisição"""
+    content = f"{request.method} {request.path}\n{_dump(request.data)}"
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+def _replay(entry, request_fingerprint):
+    stored_fingerprint, status_code, data = entry
+    if stored_fingerprint != request_fingerprint:
+        return Response({'message': f'{HEADER} já usada em outra requisição'},
+                        status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+    return Response(data, status=status_code, headers={REPLAYED_HEADER: 'true'})
+
+
+def _remember(user_id, key, record):
+    remaining = key_ttl() - (timezone.now() - record.created_at).total_seconds()
+    if remaining > 0:
+        get_store().set(_cache_key(user_id, key), (record.fingerprint, record.status_code, record.response), remaining)
+
+
+def _cutoff():
+    return timezone.now() - timezone.timedelta(seconds=key_ttl())
+
+
+def _find(user_id, key):
+    # Registro ainda válido da chave, se houver
+    return IdempotencyKey.objects.filter(user_id=user_id, key=key, created_at__gt=_cutoff()).first()
+
+
+def _claim(user_id, key, request_fingerprint):
+    # Reserva a chave. Retorna (registro, criado); uma chave vencida que
+    # ainda não foi removida é apagada e reservada de novo
+    cutoff = _cutoff()
+    while True:
+        try:
+            with transaction.atomic():
+                record = IdempotencyKey.objects.create(user_id=user_id, key=key, fingerprint=request_fingerprint)
+            return record, True
+        except IntegrityError:
+            pass
+
+        record = IdempotencyKey.objects.filter(user_id=user_id, key=key).first()
+        if record is not None and record.created_at > cutoff:
+            return record, False
+        if record is not None:
+            record.delete()
+
+
+def idempotent(view):
+    """Decorador dos métodos de view que movimentam dinheiro.
+
+    Sem o cabeçalho (ou sem usuário autenticado) a view é executada como antes.
+    """
+    @functools.wraps(view)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        user_id = request.user.pk
+        if not key or user_id is None:
+            return view(self, request, *args, **kwargs)
+
+        if len(key) > MAX_KEY_LENGTH:
+            return Response({'message': f'{HEADER} deve ter no máximo {MAX_KEY_LENGTH} caracteres'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        request_fingerprint = fingerprint(request)
+        entry = get_store().get(_cache_key(user_id, key))
+        if entry is not None:
+            return _replay(entry, request_fingerprint)
+
+        # Repetição vinda de outro processo: uma leitura, sem abrir transação
+        record = _find(user_id, key)
+        if record is not None:
+            _remember(user_id, key, record)
+            return _replay((record.fingerprint, record.status_code, record.response), request_fingerprint)
+
+        with transaction.atomic():
+            record, created = _claim(user_id, key, request_fingerprint)
+            if not created:
+                _remember(user_id, key, record)
+                return _replay((record.fingerprint, record.status_code, record.response), request_fingerprint)
+
+            response = view(self, request, *args, **kwargs)
+            if response.status_code >= 500:
+                # Nada fica gravado: nem a chave nem o que a view escreveu
+                transaction.set_rollback(True)
+                return response
+
+            record.status_code = response.status_code
+            record.response = json.loads(_dump(response.data))
+            record.save(update_fields=['status_code', 'response'])
+
+        _remember(user_id, key, record)
+        return response
+
+    return wrapper
+
+
+def purge_expired(chunk_size=1000):
+    """Remove as chaves vencidas em blocos; retorna quantas foram removidas"""
+    cutoff = _cutoff()
+    removed = 0
+    while True:
+        ids = list(IdempotencyKey.objects.filter(created_at__lte=cutoff).values_list('id', flat=True)[:chunk_size])
+        if not ids:
+            return removed
+        removed += IdempotencyKey.objects.filter(id__in=ids).delete()[0]
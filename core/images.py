@@ -0,0 +1,164 @@
+""" Imagens de perfil: original deduplicado e miniaturas fora da requisição
+
+O original é gravado com o hash SHA-256 do arquivo enviado no nome, então o
+mesmo arquivo enviado duas vezes (ou por dois usuários) ocupa um único
+arquivo. Como ele também é servido publicamente, é recodificado no mesmo
+formato com a rotação do EXIF aplicada e sem metadados (localização GPS,
+modelo da câmera...). As miniaturas de cada tamanho em `USER_THUMBNAIL_SIZES` e formato
+em `USER_THUMBNAIL_FORMATS` são geradas em um pool de threads depois do
+commit, sem metadados (EXIF, ICC, XMP), e têm nomes derivados do original,
+de modo que as URLs podem ser montadas sem consultar o storage.
+"""
+import hashlib
+import io
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_DIR = os.path.join('uploads', 'user')
+THUMBNAIL_DIR = os.path.join(UPLOAD_DIR, 'thumbs')
+
+# Extensão gravada a partir do formato detectado pelo Pillow, não do nome enviado
+EXTENSIONS = {'JPEG': '.jpg', 'PNG': '.png', 'GIF': '.gif', 'WEBP': '.webp'}
+# Recodificação do original; formatos fora da lista viram PNG
+ORIGINAL_OPTIONS = {
+    'JPEG': {'format': 'JPEG', 'quality': 90, 'optimize': True},
+    'PNG': {'format': 'PNG', 'optimize': True},
+    'GIF': {'format': 'GIF'},
+    'WEBP': {'format': 'WEBP', 'quality': 90},
+}
+SAVE_OPTIONS = {
+    'webp': {'format': 'WEBP', 'quality': 80, 'method': 4},
+    'jpeg': {'format': 'JPEG', 'quality': 85, 'optimize': True, 'progressive': True},
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def sizes():
+    return tuple(getattr(settings, 'USER_THUMBNAIL_SIZES', (64, 256)))
+
+
+def formats():
+    return tuple(getattr(settings, 'USER_THUMBNAIL_FORMATS', ('webp', 'jpeg')))
+
+
+def content_hash(file, chunk_size=64 * 1024):
+    digest = hashlib.sha256()
+    file.seek(0)
+    for chunk in iter(lambda: file.read(chunk_size), b''):
+        digest.update(chunk)
+    file.seek(0)
+    return digest.hexdigest()
+
+
+def _upright(image):
+    # Aplica a rotação do EXIF e normaliza o modo (paleta vira RGB/RGBA)
+    image = ImageOps.exif_transpose(image)
+    return image.convert('RGBA' if 'A' in image.getbands() or 'transparency' in image.info else 'RGB')
+
+
+def _strip_original(file):
+    # Original recodificado sem metadados; retorna (conteúdo, extensão)
+    with Image.open(file) as image:
+        image_format = image.format if image.format in ORIGINAL_OPTIONS else 'PNG'
+        clean = _encode(_upright(image), image_format.lower())
+
+    buffer = io.BytesIO()
+    clean.save(buffer, **ORIGINAL_OPTIONS[image_format])
+    return ContentFile(buffer.getvalue()), EXTENSIONS[image_format]
+
+
+def store_original(file):
+    """Grava o arquivo enviado, sem metadados, com nome pelo conteúdo e retorna o nome no storage"""
+    digest = content_hash(file)
+    content, extension = _strip_original(file)
+
+    name = os.path.join(UPLOAD_DIR, f'{digest}{extension}')
+    if not default_storage.exists(name):
+        name = default_storage.save(name, content)
+    return name
+
+
+def thumbnail_name(original, size, fmt):
+    stem = os.path.splitext(os.path.basename(original))[0]
+    return os.path.join(THUMBNAIL_DIR, f'{stem}-{size}.{"jpg" if fmt == "jpeg" else fmt}')
+
+
+def thumbnail_urls(original):
+    """{'64': {'webp': url, 'jpeg': url}, ...} para o nome do original"""
+    if not original:
+        return None
+    return {
+        str(size): {fmt: default_storage.url(thumbnail_name(original, size, fmt)) for fmt in formats()}
+        for size in sizes()
+    }
+
+
+def _encode(image, fmt):
+    # Imagem nova, sem `info`: nenhum metadado do original é copiado
+    if fmt == 'jpeg' and image.mode != 'RGB':
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A') if 'A' in image.getbands() else None)
+        image = background
+    clean = Image.new(image.mode, image.size)
+    clean.paste(image)
+    return clean
+
+
+def make_thumbnails(original):
+    """Gera as miniaturas que ainda não existem; retorna quantas foram gravadas"""
+    pending = [
+        (size, fmt) for size in sizes() for fmt in formats()
+        if not default_storage.exists(thumbnail_name(original, size, fmt))
+    ]
+    if not pending:
+        return 0
+
+    with default_storage.open(original, 'rb') as file, Image.open(file) as image:
+        # Aplica a rotação do EXIF antes de descartá-lo
+        image = _upright(image)
+
+        for size, fmt in pending:
+            thumbnail = image.copy()
+            thumbnail.thumbnail((size, size), Image.LANCZOS)
+            thumbnail = _encode(thumbnail, fmt)
+
+            path = default_storage.path(thumbnail_name(original, size, fmt))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Escrita atômica: quem ler a URL nunca vê um arquivo pela metade
+            tmp = f'{path}.{threading.get_ident()}.tmp'
+            thumbnail.save(tmp, **SAVE_OPTIONS[fmt])
+            os.replace(tmp, path)
+    return len(pending)
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'IMAGE_WORKERS', 2), thread_name_prefix='thumbnails',
+            )
+        return _executor
+
+
+def _log_failure(future):
+    if future.exception() is not None:
+        logger.error('falha ao gerar miniaturas', exc_info=future.exception())
+
+
+def schedule_thumbnails(original):
+    """Agenda a geração das miniaturas no pool; retorna o Future"""
+    future = _get_executor().submit(make_thumbnails, original)
+    future.add_done_callback(_log_failure)
+    return future
@@ -0,0 +1,300 @@
+""" Motor de movimentação de saldo das contas
+
+Todas as operações que alteram saldo passam por aqui. Cada movimentação
+grava uma `Transfer` (o registro de negócio, usado pelo extrato) e as suas
+pernas em `LedgerEntry`, uma tabela só de INSERTs em partidas dobradas.
+O saldo de uma conta é o total compactado em `Account.balance` mais a
+soma dos lançamentos posteriores a `Account.ledger_applied_id`; `compact()`
+incorpora essa cauda ao total periodicamente.
+
+Assim a conta de destino nunca tem a linha alterada nem travada: receber
+é só um INSERT. A conta de origem precisa de saldo, então o débito é
+verificado depois de gravado (o saldo com o novo lançamento não pode ficar
+negativo) e, nos bancos com SELECT ... FOR UPDATE, a linha da origem é
+travada para serializar débitos concorrentes da mesma conta. Em SQLite a
+transação sempre começa escrevendo, o que evita o deadlock na promoção do
+lock de leitura para escrita.
+"""
+import decimal
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import DecimalField, Exists, F, Max, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from core.models import Account, LedgerEntry, Transfer
+
+ZERO = decimal.Decimal('0.00')
+
+
+class LedgerError(Exception):
+    """Erro base das operações de saldo"""
+    message = 'operação inválida'
+
+    def __init__(self, message=None):
+        super().__init__(message or self.message)
+        self.message = message or self.message
+
+
+class InvalidValue(LedgerError):
+    message = 'valor de transferencia invalido'
+
+
+class InsufficientBalance(LedgerError):
+    message = 'No balance enough'
+
+
+class AccountNotFound(LedgerError):
+    message = 'conta não encontrada'
+
+
+class AccountNotOwned(LedgerError):
+    message = 'Esta conta não é do usuário logado'
+
+
+def _quantize(value):
+    # Normaliza o valor para 2 casas decimais, como no modelo
+    try:
+        value = round(decimal.Decimal(value), 2)
+    except (decimal.InvalidOperation, TypeError, ValueError):
+        raise InvalidValue()
+
+    if value <= 0:
+        raise InvalidValue()
+    return value
+
+
+def _account_id(value):
+    # Ids vindos da URL ou do corpo da requisição; inválido é conta inexistente
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise AccountNotFound()
+
+
+def _tail():
+    # Soma dos lançamentos da conta ainda não incorporados a Account.balance
+    entries = (LedgerEntry.objects
+               .filter(account=OuterRef('pk'), id__gt=OuterRef('ledger_applied_id'))
+               .values('account').annotate(total=Sum('amount')).values('total'))
+    return Coalesce(Subquery(entries), Value(ZERO), output_field=DecimalField(max_digits=12, decimal_places=2))
+
+
+def with_balance(queryset):
+    """Anota `current_balance` (saldo compactado + cauda) nas contas do queryset"""
+    return queryset.annotate(current_balance=F('balance') + _tail())
+
+
+def balances(account_ids):
+    """{id: saldo atual} das contas, em uma única query"""
+    return dict(with_balance(Account.objects.filter(id__in=account_ids)).values_list('id', 'current_balance'))
+
+
+def balance(account_id):
+    """Saldo atual da conta"""
+    value = with_balance(Account.objects.filter(id=account_id)).values_list('current_balance', flat=True).first()
+    if value is None:
+        raise AccountNotFound()
+    return value
+
+
+def _lock(account_id):
+    # Serializa os débitos da mesma conta; não altera a linha
+    if connection.features.has_select_for_update:
+        list(Account.objects.select_for_update().filter(id=account_id).values_list('id'))
+
+
+def _post(transfers_legs):
+    # Grava as pernas de cada transferência: [(transfer, [(conta, valor), ...]), ...]
+    LedgerEntry.objects.bulk_create([
+        LedgerEntry(account_id=account_id, transfer=transfer, amount=amount, created_at=transfer.created_at)
+        for transfer, legs in transfers_legs
+        for account_id, amount in legs
+    ])
+
+
+def _check_debit(account_id, user=None, receiver_id=None):
+    # Depois de gravar o débito: a conta existe, é do usuário e o saldo não
+    # ficou negativo. A conta de destino, se houver, é conferida na mesma query
+    ids = [account_id] if receiver_id is None else [account_id, receiver_id]
+    states = {
+        pk: (owner, current) for pk, owner, current in
+        with_balance(Account.objects.filter(id__in=ids)).values_list('id', 'user_id', 'current_balance')
+    }
+    if account_id not in states or (receiver_id is not None and receiver_id not in states):
+        raise AccountNotFound()
+    owner, current = states[account_id]
+    if user is not None and owner != user.pk:
+        raise AccountNotOwned()
+    if current < 0:
+        raise InsufficientBalance()
+    return current
+
+
+def _require(account_id, user=None):
+    # A conta existe e, se `user` for informado, pertence a ele
+    owner = Account.objects.filter(id=account_id).values_list('user_id', flat=True).first()
+    if owner is None:
+        raise AccountNotFound()
+    if user is not None and owner != user.pk:
+        raise AccountNotOwned()
+
+
+def transfer(sender_id, receiver_id, value, description=None, user=None):
+    """Transfere `value` de `sender_id` para `receiver_id`.
+
+    Se `user` for informado, a conta de origem precisa pertencer a ele.
+    Só a linha da origem é travada; a de destino apenas recebe um lançamento.
+    """
+    value = _quantize(value)
+
+    sender_id, receiver_id = _account_id(sender_id), _account_id(receiver_id)
+
+    with transaction.atomic():
+        _lock(sender_id)
+        created = Transfer.objects.create(
+            sender_id=sender_id,
+            receiver_id=receiver_id,
+            value=value,
+            description=description,
+        )
+        _post([(created, [(sender_id, -value), (receiver_id, value)])])
+        _check_debit(sender_id, user, receiver_id)
+        return created
+
+
+def transfer_batch(sender_id, items, user=None):
+    """Aplica várias transferências de uma mesma conta em uma única transação.
+
+    `items` é uma lista de dicts com `receiver`, `value` e `description`.
+    Itens inválidos (valor ou conta de destino inexistente) são rejeitados
+    individualmente; os demais são aplicados juntos, ou nenhum deles se o
+    saldo não cobrir o total. Retorna um resultado por item, na ordem recebida.
+    """
+    sender_id = _account_id(sender_id)
+
+    results, valid = [], []
+    for index, item in enumerate(items):
+        try:
+            value = _quantize(item.get('value'))
+            receiver_id = int(item.get('receiver'))
+        except LedgerError as e:
+            results.append({'index': index, 'status': 'rejected', 'message': e.message})
+            continue
+        except (TypeError, ValueError):
+            results.append({'index': index, 'status': 'rejected', 'message': AccountNotFound.message})
+            continue
+        results.append({'index': index, 'status': 'ok'})
+        valid.append((index, receiver_id, value, item.get('description')))
+
+    # Contas de destino inexistentes são rejeitadas antes de abrir a transação
+    existing = set(Account.objects.filter(id__in={r for _, r, _, _ in valid}).values_list('id', flat=True))
+    for index, receiver_id, _, _ in valid:
+        if receiver_id not in existing:
+            results[index] = {'index': index, 'status': 'rejected', 'message': AccountNotFound.message}
+    valid = [entry for entry in valid if entry[1] in existing]
+
+    if not valid:
+        return results
+
+    with transaction.atomic():
+        _lock(sender_id)
+        created = Transfer.objects.bulk_create([
+            Transfer(sender_id=sender_id, receiver_id=receiver_id, value=value, description=description)
+            for _, receiver_id, value, description in valid
+        ])
+        _post([
+            (row, [(sender_id, -value), (receiver_id, value)])
+            for row, (_, receiver_id, value, _) in zip(created, valid)
+        ])
+        _check_debit(sender_id, user)
+
+    for (index, _, _, _), row in zip(valid, created):
+        results[index]['id'] = row.pk
+    return results
+
+
+def debit_many(debits, description):
+    """Debita várias contas de uma vez (usado pela cobrança em lote).
+
+    `debits` é uma lista de (conta, valor, complemento da descrição). Deve
+    ser chamada dentro de uma transação, com as contas já travadas; lança
+    InsufficientBalance se alguma conta ficar negativa.
+    """
+    created = Transfer.objects.bulk_create([
+        Transfer(sender_id=account_id, receiver=None, value=value, description=f'{description} {suffix}')
+        for account_id, value, suffix in debits
+    ])
+    _post([(row, [(row.sender_id, -row.value), (None, row.value)]) for row in created])
+
+    accounts = {account_id for account_id, _, _ in debits}
+    if with_balance(Account.objects.filter(id__in=accounts)).filter(current_balance__lt=0).exists():
+        raise InsufficientBalance()
+    return created
+
+
+def deposit(account_id, value, description="", user=None):
+    """Deposita `value` na conta e retorna o novo saldo.
+
+    Se `user` for informado, a conta precisa pertencer a ele.
+    """
+    value = _quantize(value)
+    account_id = _account_id(account_id)
+
+    with transaction.atomic():
+        created = Transfer.objects.create(sender=None, receiver_id=account_id, value=value, description=description)
+        _require(account_id, user)
+        _post([(created, [(None, -value), (account_id, value)])])
+        return balance(account_id)
+
+
+def withdraw(account_id, value, user=None):
+    """Retira `value` da conta e retorna o novo saldo"""
+    value = _quantize(value)
+
+    account_id = _account_id(account_id)
+
+    with transaction.atomic():
+        _lock(account_id)
+        created = Transfer.objects.create(sender_id=account_id, receiver=None, value=value, description="")
+        _post([(created, [(account_id, -value), (None, value)])])
+        return _check_debit(account_id, user)
+
+
+def _compactable_until(lag):
+    # Maior lançamento criado há mais de `lag` segundos. Em bancos com
+    # transações concorrentes um id menor pode ainda não estar confirmado;
+    # a folga garante que ele já esteja visível antes de ser incorporado
+    cutoff = timezone.now() - timezone.timedelta(seconds=lag)
+    return LedgerEntry.objects.filter(created_at__lte=cutoff).aggregate(m=Max('id'))['m']
+
+
+def compact(chunk_size=1000, lag=None):
+    """Incorpora a cauda de lançamentos ao saldo compactado das contas.
+
+    Percorre as contas em blocos por id. Cada bloco é um único UPDATE com
+    subquery correlacionada (saldo += cauda até a marca d'água), que só
+    altera as contas com lançamentos novos; como a leitura e a escrita são
+    o mesmo comando, execuções concorrentes não somam a cauda duas vezes.
+    Retorna (marca d'água, contas atualizadas).
+    """
+    lag = getattr(settings, 'LEDGER_COMPACTION_LAG', 60) if lag is None else lag
+    until = _compactable_until(lag)
+    if until is None:
+        return 0, 0
+
+    pending = LedgerEntry.objects.filter(account=OuterRef('pk'), id__gt=OuterRef('ledger_applied_id'), id__lte=until)
+    total = Subquery(pending.values('account').annotate(total=Sum('amount')).values('total'))
+
+    updated, last = 0, 0
+    while True:
+        ids = list(Account.objects.filter(id__gt=last).order_by('id').values_list('id', flat=True)[:chunk_size])
+        if not ids:
+            return until, updated
+        last = ids[-1]
+
+        updated += (Account.objects
+                    .filter(id__in=ids, ledger_applied_id__lt=until)
+                    .filter(Exists(pending))
+                    .update(balance=F('balance') + total, ledger_applied_id=until))
@@ -0,0 +1,87 @@
+""" Criação de empréstimos e compras a prazo com suas parcelas
+
+O cronograma inteiro é calculado em memória e gravado com um único
+bulk_create, na mesma transação que cria o Loan/Credit e credita o saldo.
+Assim o número de queries não depende da quantidade de parcelas.
+"""
+import datetime
+import decimal
+
+from dateutil.relativedelta import relativedelta
+from django.db import transaction
+from django.db.models import DecimalField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from core import amortization, ledger
+from core.models import Credit, CreditInstallments, Loan, LoanInstallments
+
+CENTS = decimal.Decimal('0.01')
+
+
+def _due_dates(start, installments, day=None):
+    # Datas de vencimento mensais a partir de `start`, à meia-noite
+    dates = []
+    for i in range(installments):
+        due = datetime.datetime.combine(start + relativedelta(months=+i), datetime.time.min)
+        if day is not None:
+            due = due.replace(day=day)
+        dates.append(timezone.make_aware(due))
+    return dates
+
+
+def loan_schedule(value, installments, fees, start=None):
+    """Retorna a lista de (vencimento, valor) das parcelas de um empréstimo.
+
+    As parcelas seguem a tabela Price com a taxa mensal de `Loan.fees` e
+    vencem mensalmente a partir do mês seguinte ao da contratação.
+    """
+    start = start or datetime.date.today()
+    table = amortization.schedule(value, installments, amortization.rate_from_fees(fees))
+    dates = _due_dates(start + relativedelta(months=+1), installments)
+
+    return [(due, row.payment) for due, row in zip(dates, table)]
+
+
+def credit_schedule(value, installments, start=None):
+    """Retorna a lista de (vencimento, valor) das parcelas de uma compra a prazo"""
+    start = start or datetime.date.today()
+    value = (decimal.Decimal(value) / installments).quantize(CENTS, decimal.ROUND_HALF_EVEN)
+
+    return [(due, value) for due in _due_dates(start, installments, day=5)]
+
+
+def create_loan(account, value, installments):
+    """Cria o empréstimo, suas parcelas e credita o valor na conta"""
+    with transaction.atomic():
+        loan = Loan.objects.create(account=account, value=value, installments=installments)
+        LoanInstallments.objects.bulk_create(
+            LoanInstallments(loanId=loan, due_date=due, value=amount, payed_date=None)
+            for due, amount in loan_schedule(loan.value, installments, loan.fees)
+        )
+        # O valor liberado entra como depósito, para que todo saldo tenha uma transferência de origem
+        ledger.deposit(account.pk, value, description=f"Empréstimo {loan.pk}")
+    return loan
+
+
+def create_credit(account, value, installments):
+    """Cria a compra a prazo e suas parcelas"""
+    with transaction.atomic():
+        credit = Credit.objects.create(account=account, value=value, installments=installments)
+        CreditInstallments.objects.bulk_create(
+            CreditInstallments(creditId=credit, due_date=due, value=amount)
+            for due, amount in credit_schedule(value, installments)
+        )
+    return credit
+
+
+def with_open_installments(queryset):
+    """Anota `remaining_balance` e `next_due_date` (parcelas em aberto) nos créditos do queryset"""
+    open_installments = CreditInstallments.objects.filter(creditId=OuterRef('pk'), payed_date__isnull=True)
+    remaining = open_installments.values('creditId').annotate(total=Sum('value')).values('total')
+    next_due = open_installments.order_by('due_date').values('due_date')[:1]
+    return queryset.annotate(
+        remaining_balance=Coalesce(Subquery(remaining), Value(ledger.ZERO),
+                                   output_field=DecimalField(max_digits=12, decimal_places=2)),
+        next_due_date=Subquery(next_due),
+    )
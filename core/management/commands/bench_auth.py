@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from rest_framework.request import Request
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.tokens import AccessToken
+
+from core import authentication
+from core.bench import Timer, bench_database
+from core.models import User
+
+
+class Command(BaseCommand):
+    help = "Compara o custo por requisição do JWTAuthentication com o CachedJWTAuthentication"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        with bench_database():
+            user = User.objects.create_user('bench@fastbank.com', 'bench', cpf='52998224725')
+            header = f'Bearer {AccessToken.for_user(user)}'
+            authentication.invalidate_user(user.pk)
+
+            for name, backend in (('JWTAuthentication', JWTAuthentication()),
+                                  ('CachedJWTAuthentication', authentication.CachedJWTAuthentication())):
+                requests = [
+                    Request(RequestFactory().get('/api/v1/accounts/', HTTP_AUTHORIZATION=header))
+                    for _ in range(options['requests'])
+                ]
+                with CaptureQueriesContext(connection) as queries, Timer() as elapsed:
+                    for request in requests:
+                        backend.authenticate(request)
+
+                self.stdout.write(
+                    f"{name:<24} {elapsed.elapsed / options['requests'] * 1e6:8.1f}µs por requisição, "
+                    f"{len(queries) / options['requests']:.3f} queries por requisição"
+                )
@@ -0,0 +1,52 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from core.bench import Timer, bench_database
+from core.models import Account, User
+
+
+class Command(BaseCommand):
+    help = "Compara POST /transfer/batch/ com N chamadas a POST /transfer/"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--items', type=int, default=200)
+        parser.add_argument('--receivers', type=int, default=20)
+
+    def handle(self, *args, **options):
+        with bench_database(), override_settings(ALLOWED_HOSTS=['*']):
+            self.run(options)
+
+    def run(self, options):
+        user = User.objects.create_user('bench@fastbank.com', 'bench', cpf='52998224725')
+        sender = Account.objects.create(user=user, agency='0001', number='0' * 16, nickname='sender',
+                                        balance=1000000)
+        receivers = [
+            Account.objects.create(user=user, agency='0001', number=str(i).zfill(16), nickname=f'r{i}')
+            for i in range(1, options['receivers'] + 1)
+        ]
+        items = [
+            {'receiver': receivers[i % len(receivers)].id, 'value': '1.00', 'description': f'payroll {i}'}
+            for i in range(min(options['items'], settings.TRANSFER_BATCH_MAX_ITEMS))
+        ]
+
+        # Autenticação real via JWT, como um cliente faria
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}')
+
+        with CaptureQueriesContext(connection) as single_queries, Timer() as single_time:
+            for item in items:
+                client.post('/api/v1/transfer/', {'sender': sender.id, **item}, format='json')
+
+        with CaptureQueriesContext(connection) as batch_queries, Timer() as batch_time:
+            response = client.post('/api/v1/transfer/batch/', {'sender': sender.id, 'transfers': items}, format='json')
+
+        ok = sum(result['status'] == 'ok' for result in response.json()['results'])
+        self.stdout.write(f"{len(items)} chamadas individuais: {len(single_queries)} queries, "
+                          f"{single_time.elapsed * 1000:.1f}ms")
+        self.stdout.write(f"1 lote com {ok}/{len(items)} itens: {len(batch_queries)} queries, "
+                          f"{batch_time.elapsed * 1000:.1f}ms "
+                          f"({single_time.elapsed / batch_time.elapsed:.1f}x mais rápido)")
@@ -0,0 +1,83 @@
+import datetime
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from core import collection, snapshots
+from core.bench import Timer, bench_database
+from core.models import Account, Loan, LoanInstallments, Transfer, User
+
+
+class Command(BaseCommand):
+    help = "Mede a cobrança em lote de parcelas vencidas (tempo, queries e pico de memória)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--installments', type=int, default=1000000)
+        parser.add_argument('--per-loan', type=int, default=12)
+        parser.add_argument('--accounts', type=int, default=1000)
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--trace-memory', action='store_true',
+                            help='mede o pico de memória com tracemalloc (deixa a execução bem mais lenta)')
+
+    def handle(self, *args, **options):
+        with bench_database():
+            self.seed(options)
+            self.run(options)
+
+    def seed(self, options):
+        user = User.objects.create_user('bench@fastbank.com', 'bench', cpf='52998224725')
+        accounts = Account.objects.bulk_create([
+            Account(user=user, agency='0001', number=str(i).zfill(16), nickname=f'bench {i}', balance=1000000)
+            for i in range(options['accounts'])
+        ])
+        Transfer.objects.bulk_create([
+            Transfer(sender=None, receiver=account, value=account.balance, description='') for account in accounts
+        ])
+
+        # Todas as parcelas já vencidas, espalhadas pelo último ano
+        due = timezone.now() - datetime.timedelta(days=365)
+        loans = options['installments'] // options['per_loan']
+        with Timer() as seed_time:
+            for start in range(0, loans, 1000):
+                with transaction.atomic():
+                    created = Loan.objects.bulk_create([
+                        Loan(account=accounts[i % len(accounts)], installments=options['per_loan'], value=1000)
+                        for i in range(start, min(start + 1000, loans))
+                    ])
+                    LoanInstallments.objects.bulk_create([
+                        LoanInstallments(loanId=loan, value=10, due_date=due + datetime.timedelta(days=n * 30))
+                        for loan in created
+                        for n in range(options['per_loan'])
+                    ])
+        self.stdout.write(f"{loans * options['per_loan']} parcelas geradas em {seed_time.elapsed:.1f}s")
+
+    def run(self, options):
+        queries = 0
+
+        def count(execute, sql, params, many, context):
+            nonlocal queries
+            queries += 1
+            return execute(sql, params, many, context)
+
+        paid = chunks = 0
+        if options['trace_memory']:
+            tracemalloc.start()
+        with connection.execute_wrapper(count), Timer() as elapsed:
+            for result in collection.collect('loan', chunk_size=options['chunk_size']):
+                paid += result.paid
+                chunks += 1
+
+        settled = Loan.objects.filter(payed=True).count()
+        self.stdout.write(
+            f"{paid} parcelas pagas em {elapsed.elapsed:.1f}s ({paid / elapsed.elapsed:.0f}/s), "
+            f"{chunks} blocos, {queries / max(chunks, 1):.1f} queries por bloco, {settled} empréstimos quitados"
+        )
+        if options['trace_memory']:
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            self.stdout.write(f"pico de memória durante a cobrança: {peak / 2 ** 20:.1f}MB")
+
+        mismatches = sum(1 for _ in snapshots.mismatches())
+        self.stdout.write(f"contas divergentes após a cobrança: {mismatches}")
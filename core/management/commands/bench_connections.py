@@ -0,0 +1,76 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+from django.db.backends.signals import connection_created
+from django.test.utils import override_settings
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from core import ledger
+from core.bench import Timer, bench_database, percentiles
+from core.models import Account, User
+
+
+class Command(BaseCommand):
+    help = "Mede quanto da latência das requisições é gasto abrindo conexões (CONN_MAX_AGE=0 x persistente)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--conn-max-age', type=int, default=60)
+
+    def handle(self, *args, **options):
+        with bench_database(), override_settings(ALLOWED_HOSTS=['*']):
+            user = User.objects.create_user('bench@fastbank.com', 'bench', cpf='52998224725')
+            account = Account.objects.create(user=user, agency='0001', number='0' * 16, nickname='bench')
+            ledger.deposit(account.id, '1000.00')
+
+            client = APIClient()
+            client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}')
+            url = f'/api/v1/transfer/{account.id}/statement/'
+
+            # Custo de abrir uma conexão (inclui os PRAGMAs em SQLite)
+            samples = []
+            for _ in range(50):
+                connection.close()
+                with Timer() as setup:
+                    connection.ensure_connection()
+                samples.append(setup.elapsed)
+            setup_ms = percentiles(samples, (50,))['p50']
+            self.stdout.write(f"{connection.vendor}: abrir uma conexão leva {setup_ms:.3f}ms (p50)")
+
+            before = self.run(client, url, 0, options['requests'])
+            after = self.run(client, url, options['conn_max_age'], options['requests'])
+            share = (before['p50'] - after['p50']) / before['p50'] * 100 if before['p50'] else 0.0
+            self.stdout.write(f"conexão por requisição representa {share:.1f}% da latência p50")
+
+    def run(self, client, url, conn_max_age, requests):
+        connection.close()
+        connection.settings_dict['CONN_MAX_AGE'] = conn_max_age
+
+        connects = 0
+
+        def count(sender, **kwargs):
+            nonlocal connects
+            connects += 1
+
+        connection_created.connect(count)
+        latencies = []
+        try:
+            for _ in range(requests):
+                # O cliente de teste não dispara o fechamento de conexões do
+                # handler; repete aqui o que request_started/finished fazem
+                begin = time.perf_counter()
+                close_old_connections()
+                client.get(url)
+                close_old_connections()
+                latencies.append(time.perf_counter() - begin)
+        finally:
+            connection_created.disconnect(count)
+
+        stats = percentiles(latencies)
+        self.stdout.write(
+            f"CONN_MAX_AGE={conn_max_age:<4} p50 {stats['p50']:.2f}ms p99 {stats['p99']:.2f}ms, "
+            f"{connects} conexões abertas em {requests} requisições"
+        )
+        return stats
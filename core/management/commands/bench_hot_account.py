@@ -0,0 +1,73 @@
+import decimal
+import threading
+
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection
+
+from core import ledger
+from core.bench import Timer, bench_database, percentiles
+from core.models import Account, User
+
+
+class Command(BaseCommand):
+    help = "Vazão de transferências de várias contas para uma única conta de destino (conta quente)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--transfers', type=int, default=100, help='transferências por thread')
+
+    def handle(self, *args, **options):
+        with bench_database():
+            self.run(options)
+
+    def run(self, options):
+        value = decimal.Decimal('1.00')
+        user = User.objects.create_user('bench@fastbank.com', 'bench', cpf='52998224725')
+        hot = Account.objects.create(user=user, agency='0001', number='0' * 16, nickname='hot')
+        senders = [
+            Account.objects.create(user=user, agency='0001', number=str(i).zfill(16), nickname=f's{i}')
+            for i in range(1, options['threads'] + 1)
+        ]
+        for sender in senders:
+            ledger.deposit(sender.id, options['transfers'] * value)
+
+        latencies, retries = [], [0]
+        lock = threading.Lock()
+
+        def worker(sender):
+            local = []
+            try:
+                for _ in range(options['transfers']):
+                    while True:
+                        with Timer() as t:
+                            try:
+                                ledger.transfer(sender.id, hot.id, value, user=user)
+                            except OperationalError:
+                                # SQLite devolve "database is locked" após o busy timeout
+                                with lock:
+                                    retries[0] += 1
+                                continue
+                        local.append(t.elapsed)
+                        break
+            finally:
+                connection.close()
+            with lock:
+                latencies.extend(local)
+
+        threads = [threading.Thread(target=worker, args=(sender,)) for sender in senders]
+        with Timer() as total:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        count = len(latencies)
+        expected = options['threads'] * options['transfers'] * value
+        balance = ledger.balance(hot.id)
+        self.stdout.write(f"{connection.vendor}: {count} transferências para a conta quente em "
+                          f"{total.elapsed:.2f}s ({count / total.elapsed:.1f}/s), retries: {retries[0]}")
+        self.stdout.write("latência (ms): " + ", ".join(f"{k}={v:.2f}" for k, v in percentiles(latencies).items()))
+        if balance != expected:
+            self.stderr.write(self.style.ERROR(f"saldo da conta quente {balance}, esperado {expected}"))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"saldo da conta quente confere: {balance}"))
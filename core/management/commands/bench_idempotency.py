@@ -0,0 +1,98 @@
+import threading
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from core import idempotency, ledger
+from core.bench import Timer, bench_database, percentiles
+from core.models import Account, IdempotencyKey, User
+
+
+class Command(BaseCommand):
+    help = "Dispara a mesma requisição com o mesmo Idempotency-Key em paralelo e confere que o dinheiro moveu uma vez"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=100, help='requisições paralelas com a mesma chave')
+        parser.add_argument('--replays', type=int, default=1000, help='repetições sequenciais para medir o custo')
+
+    def handle(self, *args, **options):
+        with bench_database(), override_settings(ALLOWED_HOSTS=['*']):
+            self.run(options)
+
+    def run(self, options):
+        user = User.objects.create_user('bench@fastbank.com', 'bench', cpf='52998224725')
+        sender = Account.objects.create(user=user, agency='0001', number='0' * 16, nickname='sender')
+        receiver = Account.objects.create(user=user, agency='0001', number='1' * 16, nickname='receiver')
+        ledger.deposit(sender.id, 1000)
+
+        token = f'Bearer {AccessToken.for_user(user)}'
+        url, body = '/api/v1/transfer/', {'sender': sender.id, 'receiver': receiver.id, 'value': '10.00'}
+        key = 'bench-transfer-1'
+
+        statuses, bodies, latencies, retries = Counter(), set(), [], [0]
+        lock = threading.Lock()
+        start = threading.Barrier(options['requests'])
+
+        def worker():
+            client = APIClient()
+            client.credentials(HTTP_AUTHORIZATION=token, HTTP_IDEMPOTENCY_KEY=key)
+            try:
+                start.wait()
+                while True:
+                    with Timer() as t:
+                        try:
+                            response = client.post(url, body, format='json')
+                        except OperationalError:
+                            # SQLite devolve "database is locked" após o busy timeout
+                            with lock:
+                                retries[0] += 1
+                            continue
+                    break
+            finally:
+                connection.close()
+            replayed = response.get(idempotency.REPLAYED_HEADER) == 'true'
+            with lock:
+                statuses[(response.status_code, 'repetida' if replayed else 'executada')] += 1
+                bodies.add(response.content)
+                latencies.append(t.elapsed)
+
+        threads = [threading.Thread(target=worker) for _ in range(options['requests'])]
+        with Timer() as total:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.stdout.write(f"{options['requests']} requisições paralelas em {total.elapsed:.2f}s, retries: {retries[0]}")
+        for (code, kind), count in sorted(statuses.items()):
+            self.stdout.write(f"  {code} {kind}: {count}")
+        self.stdout.write("latência (ms): " + ", ".join(f"{k}={v:.2f}" for k, v in percentiles(latencies).items()))
+
+        # Repetições sequenciais: pelo LRU em memória e, sem ele, pela tabela
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=token, HTTP_IDEMPOTENCY_KEY=key)
+        for name, before in (('LRU em memória', lambda: None),
+                             ('tabela', lambda: idempotency.get_store().delete(idempotency._cache_key(user.pk, key)))):
+            with CaptureQueriesContext(connection) as queries, Timer() as elapsed:
+                for _ in range(options['replays']):
+                    before()
+                    client.post(url, body, format='json')
+            self.stdout.write(f"repetição via {name}: {elapsed.elapsed / options['replays'] * 1e6:.0f}µs, "
+                              f"{len(queries) / options['replays']:.1f} queries por requisição")
+
+        balances = ledger.balances([sender.id, receiver.id])
+        problems = []
+        if balances != {sender.id: 990, receiver.id: 10}:
+            problems.append(f"saldos {balances}, esperado {sender.id}: 990, {receiver.id}: 10")
+        if IdempotencyKey.objects.count() != 1:
+            problems.append(f"{IdempotencyKey.objects.count()} chaves gravadas, esperado 1")
+        if len(bodies) != 1:
+            problems.append(f"{len(bodies)} corpos de resposta diferentes, esperado 1")
+        for problem in problems:
+            self.stderr.write(self.style.ERROR(problem))
+        if not problems:
+            self.stdout.write(self.style.SUCCESS("transferência aplicada uma única vez; todas as respostas iguais"))
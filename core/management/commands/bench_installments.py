@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from core import lending
+from core.bench import Timer, bench_database
+from core.models import Account, LoanInstallments, User
+
+
+class Command(BaseCommand):
+    help = "Mede queries e tempo para criar empréstimos/créditos com muitas parcelas"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--installments', type=int, nargs='+', default=[12, 120, 360])
+
+    def handle(self, *args, **options):
+        with bench_database():
+            user = User.objects.create_user('bench@fastbank.com', 'bench', cpf='52998224725')
+            account = Account.objects.create(user=user, agency='0001', number='1' * 16, nickname='bench')
+
+            for installments in options['installments']:
+                with CaptureQueriesContext(connection) as loan_queries, Timer() as loan_time:
+                    loan = lending.create_loan(account, 10000, installments)
+                with CaptureQueriesContext(connection) as credit_queries, Timer() as credit_time:
+                    lending.create_credit(account, 900, installments)
+
+                created = LoanInstallments.objects.filter(loanId=loan).count()
+                self.stdout.write(
+                    f"{installments:>5} parcelas: empréstimo {len(loan_queries)} queries "
+                    f"{loan_time.elapsed * 1000:.1f}ms ({created} parcelas gravadas), "
+                    f"crédito {len(credit_queries)} queries {credit_time.elapsed * 1000:.1f}ms"
+                )
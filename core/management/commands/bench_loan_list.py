@@ -0,0 +1,86 @@
+import datetime
+import decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from core.bench import Timer, bench_database, percentiles
+from core.models import Account, Loan, LoanInstallments, User
+
+
+class Command(BaseCommand):
+    help = "Mede GET /loan/ (com e sem ?include=installments) enquanto a tabela de empréstimos cresce"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000],
+                            help='total de empréstimos de outros usuários em cada rodada')
+        parser.add_argument('--user-loans', type=int, default=200, help='empréstimos do usuário medido')
+        parser.add_argument('--installments', type=int, default=12, help='parcelas por empréstimo do usuário')
+        parser.add_argument('--requests', type=int, default=50, help='requisições por medição')
+
+    def handle(self, *args, **options):
+        with bench_database(), override_settings(ALLOWED_HOSTS=['*']):
+            self.run(options)
+
+    def run(self, options):
+        now = timezone.now()
+        user = User.objects.create_user('bench@fastbank.com', 'bench', cpf='52998224725')
+        accounts = [
+            Account.objects.create(user=user, agency='0001', number=str(i).zfill(16), nickname=f'a{i}')
+            for i in range(3)
+        ]
+        loans = Loan.objects.bulk_create([
+            Loan(account=accounts[i % len(accounts)], installments=options['installments'],
+                 value=decimal.Decimal('1200.00'), request_date=now - datetime.timedelta(hours=i))
+            for i in range(options['user_loans'])
+        ])
+        LoanInstallments.objects.bulk_create([
+            LoanInstallments(loanId=loan, value=decimal.Decimal('102.50'),
+                             due_date=loan.request_date + datetime.timedelta(days=30 * (n + 1)))
+            for loan in loans for n in range(options['installments'])
+        ], batch_size=5000)
+
+        other = User.objects.create_user('others@fastbank.com', 'bench', cpf='52998224725')
+        others = [
+            Account.objects.create(user=other, agency='0002', number=str(i).zfill(16), nickname=f'o{i}')
+            for i in range(100)
+        ]
+
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}')
+
+        seeded = 0
+        for size in sorted(options['sizes']):
+            with Timer() as seeding:
+                while seeded < size:
+                    batch = min(50000, size - seeded)
+                    Loan.objects.bulk_create([
+                        Loan(account=others[(seeded + i) % len(others)], installments=12,
+                             value=decimal.Decimal('1000.00'), request_date=now - datetime.timedelta(seconds=seeded + i))
+                        for i in range(batch)
+                    ], batch_size=5000)
+                    seeded += batch
+            self.stdout.write(f"{seeded} empréstimos de outros usuários (+{seeding.elapsed:.1f}s para gerar)")
+
+            for label, url in (('lista', '/api/v1/loan/'),
+                               ('lista + parcelas', '/api/v1/loan/?include=installments')):
+                # Primeira página e a página seguinte (pelo cursor)
+                first = client.get(url).json()
+                pages = [('1ª página', url), ('2ª página', first['next'])]
+                for page, page_url in pages:
+                    samples = []
+                    with CaptureQueriesContext(connection) as queries:
+                        for _ in range(options['requests']):
+                            with Timer() as t:
+                                response = client.get(page_url)
+                            samples.append(t.elapsed)
+                    rows = len(response.json()['results'])
+                    self.stdout.write(
+                        f"  {label:<16} {page}: {rows} empréstimos, "
+                        f"{len(queries) / options['requests']:.0f} queries, "
+                        + ", ".join(f"{k}={v:.2f}ms" for k, v in percentiles(samples).items())
+                    )
@@ -0,0 +1,86 @@
+import decimal
+import threading
+
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection
+from django.db.models import Q, Sum
+
+from core import ledger
+from core.bench import Timer, bench_database, percentiles
+from core.models import Account, Transfer, User
+
+
+class Command(BaseCommand):
+    help = "Benchmark de concorrência do motor de transferências (core.ledger)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=50)
+        parser.add_argument('--transfers', type=int, default=20, help='transferências por thread')
+        parser.add_argument('--value', type=str, default='1.00')
+
+    def handle(self, *args, **options):
+        with bench_database():
+            self.run(options)
+
+    def run(self, options):
+        initial = decimal.Decimal('1000000.00')
+        value = decimal.Decimal(options['value'])
+
+        user = User.objects.create_user('bench@fastbank.com', 'bench', cpf='52998224725')
+        a = Account.objects.create(user=user, agency='0001', number='1' * 16, nickname='a', balance=initial)
+        b = Account.objects.create(user=user, agency='0001', number='2' * 16, nickname='b', balance=initial)
+
+        latencies = []
+        retries = [0]
+        lock = threading.Lock()
+
+        def worker(index):
+            # Metade das threads transfere A->B e a outra metade B->A
+            sender, receiver = (a.id, b.id) if index % 2 == 0 else (b.id, a.id)
+            local = []
+            try:
+                for _ in range(options['transfers']):
+                    while True:
+                        with Timer() as t:
+                            try:
+                                ledger.transfer(sender, receiver, value, user=user)
+                            except OperationalError:
+                                # SQLite devolve "database is locked" após o busy timeout
+                                with lock:
+                                    retries[0] += 1
+                                continue
+                        local.append(t.elapsed)
+                        break
+            finally:
+                connection.close()
+            with lock:
+                latencies.extend(local)
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(options['threads'])]
+        with Timer() as total:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        # Saldo esperado de cada conta a partir das transferências gravadas
+        balances = ledger.balances([a.id, b.id])
+        drift = {}
+        for account_id, balance in balances.items():
+            received = Transfer.objects.filter(receiver=account_id).aggregate(s=Sum('value'))['s'] or 0
+            sent = Transfer.objects.filter(sender=account_id).aggregate(s=Sum('value'))['s'] or 0
+            drift[account_id] = balance - (initial + received - sent)
+
+        count = Transfer.objects.filter(Q(sender=a) | Q(receiver=a)).count()
+        expected = options['threads'] * options['transfers']
+        total_balance = sum(balances.values())
+
+        self.stdout.write(f"transferências: {count}/{expected} em {total.elapsed:.2f}s "
+                          f"({count / total.elapsed:.1f}/s), retries: {retries[0]}")
+        self.stdout.write("latência (ms): " + ", ".join(f"{k}={v:.2f}" for k, v in percentiles(latencies).items()))
+        self.stdout.write(f"soma dos saldos: {total_balance} (esperado {initial * 2})")
+
+        if count != expected or total_balance != initial * 2 or any(drift.values()):
+            self.stderr.write(self.style.ERROR(f"divergência de saldo: {drift}"))
+        else:
+            self.stdout.write(self.style.SUCCESS("divergência de saldo: 0"))
@@ -0,0 +1,54 @@
+import json
+
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from core.bench import bench_database, suite
+
+
+class Command(BaseCommand):
+    help = ("Roda a suíte de benchmark da API em um banco descartável (o banco 'default' "
+            "configurado: SQLite ou PostgreSQL) e grava o resultado em JSON")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10)
+        parser.add_argument('--transfers', type=int, default=1000, help='transferências de histórico')
+        parser.add_argument('--iterations', type=int, default=50, help='requisições por rota')
+        parser.add_argument('--only', nargs='+', help="rotas: token, account_create, deposit, withdraw, "
+                                                      "transfer, statement, loan, credit")
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--output', help='arquivo JSON de saída')
+        parser.add_argument('--compare', help='resultado JSON anterior para comparar')
+
+    def handle(self, *args, **options):
+        with bench_database(), override_settings(ALLOWED_HOSTS=['*'], PROFILING_ENABLED=False):
+            result = suite.run(
+                users=options['users'],
+                transfers=options['transfers'],
+                iterations=options['iterations'],
+                only=options['only'],
+                seed_value=options['seed'],
+            )
+
+        meta = result['meta']
+        self.stdout.write(f"commit {meta['commit']} em {meta['vendor']}, seed em {meta['seed_seconds']:.1f}s")
+        self.stdout.write(f"{'rota':<16} {'req/s':>9} {'p50':>8} {'p95':>8} {'p99':>8} {'queries':>8} {'erros':>6}")
+        for name, data in result['endpoints'].items():
+            self.stdout.write(
+                f"{name:<16} {data['rps']:>9.1f} {data['p50']:>8.2f} {data['p95']:>8.2f} {data['p99']:>8.2f} "
+                f"{data['queries_avg']:>8.1f} {data['errors']:>6}"
+            )
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(result, f, indent=2)
+
+        if options['compare']:
+            with open(options['compare']) as f:
+                diff = suite.compare(json.load(f), result)
+            self.stdout.write(f"\ndiferença para {options['compare']} (positivo = pior, exceto req/s):")
+            for name, data in diff.items():
+                self.stdout.write(
+                    f"{name:<16} p50 {data['p50_ms']:+.2f}ms  p99 {data['p99_ms']:+.2f}ms  "
+                    f"queries {data['queries_avg']:+.1f}  req/s {data['rps_pct']:+.1f}%"
+                )
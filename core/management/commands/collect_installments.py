@@ -0,0 +1,34 @@
+import datetime
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core import collection
+
+
+class Command(BaseCommand):
+    help = "Cobra as parcelas vencidas de empréstimos e créditos (pode ser interrompido e executado de novo)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--kind', choices=[*collection.KINDS, 'all'], default='all')
+        parser.add_argument('--until', type=datetime.date.fromisoformat, default=None,
+                            help='cobra parcelas vencidas até esta data (AAAA-MM-DD); padrão: agora')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        until = None
+        if options['until']:
+            until = timezone.make_aware(datetime.datetime.combine(options['until'], datetime.time.max))
+
+        kinds = list(collection.KINDS) if options['kind'] == 'all' else [options['kind']]
+        for name in kinds:
+            paid = skipped = settled = 0
+            total = 0
+            for result in collection.collect(name, until=until, chunk_size=options['chunk_size']):
+                paid += result.paid
+                skipped += result.skipped
+                settled += result.settled
+                total += result.total
+
+            self.stdout.write(f"{name}: {paid} parcelas pagas ({total}), {skipped} sem saldo, "
+                              f"{settled} contratos quitados")
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Sum
+
+from core import ledger
+from core.models import LedgerEntry
+
+
+class Command(BaseCommand):
+    help = "Incorpora os lançamentos do ledger ao saldo compactado das contas (rodar periodicamente)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--lag', type=int, default=None,
+                            help='segundos de folga (padrão: settings.LEDGER_COMPACTION_LAG)')
+        parser.add_argument('--verify', action='store_true',
+                            help='confere se a soma de todas as pernas é zero (partidas dobradas)')
+
+    def handle(self, *args, **options):
+        watermark, updated = ledger.compact(chunk_size=options['chunk_size'], lag=options['lag'])
+        self.stdout.write(f"compactado até o lançamento {watermark}: {updated} contas atualizadas")
+
+        if options['verify']:
+            total = LedgerEntry.objects.aggregate(total=Sum('amount'))['total'] or 0
+            if total:
+                self.stderr.write(self.style.ERROR(f"as pernas do ledger somam {total}, esperado 0"))
+            else:
+                self.stdout.write(self.style.SUCCESS("as pernas do ledger somam zero"))
@@ -0,0 +1,37 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core import images
+from core.models import User
+
+
+class Command(BaseCommand):
+    help = "Gera as miniaturas que faltam para as imagens de perfil já gravadas"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=getattr(settings, 'IMAGE_WORKERS', 2))
+
+    def handle(self, *args, **options):
+        names = list(
+            User.objects.exclude(url_image__isnull=True).exclude(url_image='')
+            .values_list('url_image', flat=True).distinct()
+        )
+
+        created = failed = 0
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            for name, result in zip(names, pool.map(self.generate, names)):
+                if result is None:
+                    failed += 1
+                    self.stderr.write(f"não foi possível gerar as miniaturas de {name}")
+                else:
+                    created += result
+
+        self.stdout.write(f"{created} miniaturas geradas, {failed} imagens com erro")
+
+    def generate(self, name):
+        try:
+            return images.make_thumbnails(name)
+        except (OSError, ValueError):
+            return None
@@ -0,0 +1,135 @@
+import asyncio
+import json
+import time
+import urllib.request
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.bench import percentiles
+
+# Pares (WSGI/DRF, ASGI nativo) comparados por padrão; {account} é substituído
+DEFAULT_PATHS = [
+    '/api/v1/accounts/',
+    '/api/async/v1/accounts/',
+    '/api/v1/accounts/{account}/',
+    '/api/async/v1/accounts/{account}/',
+    '/api/v1/transfer/{account}/statement/',
+    '/api/async/v1/transfer/{account}/statement/',
+    '/api/v1/credit/{account}',
+    '/api/async/v1/credit/{account}',
+]
+
+
+class Command(BaseCommand):
+    help = ("Gera carga HTTP contra um servidor já em execução (runserver, gunicorn, uvicorn...) "
+            "e compara requisições/s e latência das rotas síncronas e assíncronas")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+        parser.add_argument('--email', help='usuário para obter o token em /api/token/')
+        parser.add_argument('--password')
+        parser.add_argument('--token', help='token JWT já emitido (dispensa email/senha)')
+        parser.add_argument('--account', type=int, help='id de conta usado nas rotas com {account}')
+        parser.add_argument('--concurrency', type=int, default=1000, help='conexões simultâneas')
+        parser.add_argument('--requests', type=int, default=10000, help='requisições por rota')
+        parser.add_argument('--path', action='append', dest='paths', help='rota a testar (repetível)')
+        parser.add_argument('--json', action='store_true', help='imprime o resultado em JSON')
+
+    def handle(self, *args, **options):
+        url = urlsplit(options['base_url'])
+        token = options['token'] or self.obtain_token(options)
+        paths = options['paths'] or DEFAULT_PATHS
+
+        if any('{account}' in path for path in paths) and options['account'] is None:
+            raise CommandError('--account é obrigatório para as rotas com {account}')
+
+        results = []
+        for path in paths:
+            path = path.format(account=options['account'])
+            result = asyncio.run(run_load(
+                url.hostname, url.port or 80, path, token,
+                options['concurrency'], options['requests'],
+            ))
+            results.append(result)
+            if not options['json']:
+                self.stdout.write(
+                    f"{path:<45} {result['rps']:>9.1f} req/s  p50={result['p50']:.1f}ms "
+                    f"p99={result['p99']:.1f}ms  erros={result['errors']}"
+                )
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+
+    def obtain_token(self, options):
+        if not options['email'] or not options['password']:
+            raise CommandError('informe --token ou --email e --password')
+
+        request = urllib.request.Request(
+            options['base_url'].rstrip('/') + '/api/token/',
+            data=json.dumps({'email': options['email'], 'password': options['password']}).encode(),
+            headers={'Content-Type': 'application/json'},
+        )
+        with urllib.request.urlopen(request) as response:
+            return json.loads(response.read())['access']
+
+
+async def read_response(reader):
+    # Lê uma resposta HTTP/1.1 com Content-Length e devolve o status
+    head = await reader.readuntil(b'\r\n\r\n')
+    lines = head.decode('latin-1').split('\r\n')
+    status = int(lines[0].split()[1])
+    length = 0
+    for line in lines[1:]:
+        name, _, value = line.partition(':')
+        if name.lower() == 'content-length':
+            length = int(value)
+    if length:
+        await reader.readexactly(length)
+    return status
+
+
+async def run_load(host, port, path, token, concurrency, total):
+    """Abre `concurrency` conexões keep-alive e distribui `total` GETs entre elas"""
+    request = (
+        f"GET {path} HTTP/1.1\r\nHost: {host}:{port}\r\n"
+        f"Authorization: Bearer {token}\r\nConnection: keep-alive\r\n\r\n"
+    ).encode()
+    remaining = [total]
+    latencies, errors = [], [0]
+
+    async def worker():
+        reader = writer = None
+        while remaining[0] > 0:
+            remaining[0] -= 1
+            start = time.perf_counter()
+            try:
+                if writer is None:
+                    reader, writer = await asyncio.open_connection(host, port)
+                writer.write(request)
+                await writer.drain()
+                status = await read_response(reader)
+            except (OSError, asyncio.IncompleteReadError, ValueError, IndexError):
+                errors[0] += 1
+                if writer is not None:
+                    writer.close()
+                reader = writer = None
+                continue
+            latencies.append(time.perf_counter() - start)
+            if status >= 400:
+                errors[0] += 1
+        if writer is not None:
+            writer.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(min(concurrency, total))))
+    elapsed = time.perf_counter() - start
+
+    return {
+        'path': path,
+        'requests': total,
+        'errors': errors[0],
+        'seconds': elapsed,
+        'rps': len(latencies) / elapsed if elapsed else 0.0,
+        **percentiles(latencies, points=(50, 95, 99)),
+    }
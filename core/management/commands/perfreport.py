@@ -0,0 +1,51 @@
+import glob
+import json
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core import profiling
+
+
+class Command(BaseCommand):
+    help = "Mostra p50/p95/p99 por rota coletados pelo QueryProfilingMiddleware"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dir', default=None, help='padrão: settings.PROFILING_DIR')
+        parser.add_argument('--json', action='store_true', help='imprime o resultado em JSON')
+        parser.add_argument('--reset', action='store_true', help='apaga as amostras após o relatório')
+
+    def handle(self, *args, **options):
+        directory = options['dir'] or getattr(settings, 'PROFILING_DIR', None)
+        if not directory:
+            raise CommandError('defina PROFILING_DIR ou use --dir')
+
+        # Junta as janelas gravadas por cada processo
+        files = glob.glob(os.path.join(directory, 'perf-*.json'))
+        routes = {}
+        for path in files:
+            with open(path) as f:
+                for route, samples in json.load(f).items():
+                    routes.setdefault(route, []).extend(samples)
+
+        report = {route: profiling.summarize(samples) for route, samples in sorted(routes.items())}
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+        elif not report:
+            self.stdout.write(f"nenhuma amostra em {directory} (PROFILING_ENABLED está ligado?)")
+        else:
+            self.stdout.write(f"{'rota':<60} {'n':>6} {'p50':>8} {'p95':>8} {'p99':>8} {'db p95':>8} "
+                              f"{'ser p95':>8} {'queries':>8}")
+            for route, summary in report.items():
+                self.stdout.write(
+                    f"{route[:60]:<60} {summary['count']:>6} {summary['total']['p50']:>8.1f} "
+                    f"{summary['total']['p95']:>8.1f} {summary['total']['p99']:>8.1f} "
+                    f"{summary['db']['p95']:>8.1f} {summary['serializer']['p95']:>8.1f} "
+                    f"{summary['queries']['avg']:>8.1f}"
+                )
+
+        if options['reset']:
+            for path in files:
+                os.remove(path)
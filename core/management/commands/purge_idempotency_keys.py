@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from core import idempotency
+
+
+class Command(BaseCommand):
+    help = "Remove as chaves de idempotência vencidas (IDEMPOTENCY_KEY_TTL); rodar periodicamente"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        removed = idempotency.purge_expired(chunk_size=options['chunk_size'])
+        self.stdout.write(f"{removed} chaves removidas")
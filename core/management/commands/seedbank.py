@@ -0,0 +1,75 @@
+import datetime
+import multiprocessing
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from core.bench import datagen
+
+
+class Command(BaseCommand):
+    help = ("Gera usuários, contas, transferências, empréstimos e créditos sintéticos no banco "
+            "configurado, de forma determinística pela semente")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--accounts-per-user', type=int, default=1)
+        parser.add_argument('--transfers', type=int, default=100000)
+        parser.add_argument('--loans', type=int, default=1000)
+        parser.add_argument('--credits', type=int, default=1000)
+        parser.add_argument('--max-installments', type=int, default=24)
+        parser.add_argument('--batch-size', type=int, default=5000, help='linhas por bulk_create')
+        parser.add_argument('--workers', type=int, default=1,
+                            help='processos de inserção (em SQLite mantenha 1: só há um escritor por vez)')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--prefix', default='seed', help='prefixo dos emails gerados')
+        parser.add_argument('--password', default='seed-password')
+        parser.add_argument('--start-date', type=datetime.date.fromisoformat, default=datetime.date(2024, 1, 1))
+        parser.add_argument('--days', type=int, default=365, help='janela de datas das transações')
+
+    def handle(self, *args, **options):
+        if options['users'] * options['accounts_per_user'] < 2 and options['transfers']:
+            raise CommandError('são necessárias pelo menos 2 contas para gerar transferências')
+
+        begin = time.perf_counter()
+        password_hash = datagen.hashed_password(options['password'])
+        params = {key: options[key] for key in (
+            'seed', 'prefix', 'batch_size', 'accounts_per_user', 'max_installments', 'start_date', 'days',
+        )}
+
+        # Usuários e contas no processo pai: os ids das contas são necessários a seguir
+        datagen._ACCOUNT_IDS.clear()
+        for index, count in datagen.chunks(options['users'], options['batch_size']):
+            datagen._ACCOUNT_IDS.extend(datagen.seed_users(index, count, params, password_hash))
+        self.report('usuários/contas', len(datagen._ACCOUNT_IDS), begin)
+
+        tasks = [
+            (kind, index, count, params)
+            for kind in ('transfers', 'loans', 'credits')
+            for index, count in datagen.chunks(options[kind], options['batch_size'])
+        ]
+
+        done = {kind: 0 for kind in datagen.TASKS}
+        if options['workers'] > 1:
+            # Os filhos não podem herdar a conexão aberta do pai
+            connections.close_all()
+            context = multiprocessing.get_context('fork')
+            with context.Pool(options['workers'], initializer=datagen.init_worker) as pool:
+                for kind, count in pool.imap_unordered(datagen.run_task, tasks):
+                    done[kind] += count
+        else:
+            for task in tasks:
+                kind, count = datagen.run_task(task)
+                done[kind] += count
+
+        for kind, count in done.items():
+            self.report(kind, count, begin)
+
+        if datagen._ACCOUNT_IDS:
+            datagen.recompute_balances(min(datagen._ACCOUNT_IDS))
+        self.report('saldos recalculados', len(datagen._ACCOUNT_IDS), begin)
+
+    def report(self, label, count, begin):
+        elapsed = time.perf_counter() - begin
+        self.stdout.write(f"[{elapsed:8.1f}s] {label}: {count}")
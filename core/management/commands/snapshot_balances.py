@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from core import snapshots
+
+
+class Command(BaseCommand):
+    help = "Grava snapshots de saldo incrementais e, opcionalmente, reconcilia as contas"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--lag', type=int, default=None,
+                            help='segundos de folga (padrão: settings.LEDGER_COMPACTION_LAG)')
+        parser.add_argument('--verify', action='store_true', help='compara o saldo do ledger com o snapshot')
+
+    def handle(self, *args, **options):
+        watermark, created = snapshots.take_snapshot(chunk_size=options['chunk_size'], lag=options['lag'])
+        self.stdout.write(f"snapshot até a transferência {watermark}: {created} contas")
+
+        if not options['verify']:
+            return
+
+        mismatches = 0
+        for result in snapshots.mismatches(chunk_size=options['chunk_size']):
+            mismatches += 1
+            self.stderr.write(f"conta {result['account']}: saldo {result['balance']} esperado {result['expected']}")
+
+        if mismatches:
+            self.stderr.write(self.style.ERROR(f"{mismatches} contas divergentes"))
+        else:
+            self.stdout.write(self.style.SUCCESS("todas as contas conferem"))
@@ -1,6 +1,14 @@
 from django.core.handlers.wsgi import WSGIRequest
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
 import json
+import time
 from core.models import User
+from core.throttle import get_throttle_store
+from core import authentication, profiling
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
 from rest_framework import status
 from django.utils import timezone
 from django.http import JsonResponse
@@ -8,76 +16,184 @@ from django.http import JsonResponse
 """ Middleware que é chamado a cada requisição
 """
 class LoginAttemptsMiddleware:
+    # Funciona tanto em WSGI quanto em ASGI, sem forçar troca de thread nas views assíncronas
+    sync_capable = True
+    async_capable = True
+
+    token_path = "/api/token/"
+    max_attempts = 3
+    lock_time = timezone.timedelta(minutes=15)
+
     def __init__(self, get_response):
         self.get_response = get_response
+        self.store = get_throttle_store()
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request: WSGIRequest):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
 
-    def __call__(self, request: WSGIRequest): 
-        # Obter corpo da requisição
+        # Só o login é controlado; nas demais rotas o corpo nem é lido
+        if request.path != self.token_path:
+            return self.get_response(request)
+
+        # Obter corpo da requisição antes que a view consuma o stream
         body = request.body
 
         # Executar funções de visualização
         response = self.get_response(request)
 
-        # Verificar se o caminho é 'api/token'
-        if request.path == "/api/token/":
-            
-            # Obter conteúdo da requisição
-            content_type = request.headers.get("Content-Type", '').lower()
-
-            # Obter email ou None - em formulários ou JSON
-            if 'application/json' in content_type:
-
-                # Se o conteúdo for um JSON:
-                try:
-                    email = json.loads(body.decode('utf-8')).get('email')
-                except json.JSONDecodeError:
-                    email = None
-
-            elif 'application/x-www-form-urlencoded' in content_type:
-                
-                # Se o conteúdo for um formulário:
-                email = request.POST.get('email')
-            
-            else:
+        return self.process_login(request, body, response)
+
+    async def __acall__(self, request):
+        if request.path != self.token_path:
+            return await self.get_response(request)
+
+        body = request.body
+        response = await self.get_response(request)
+
+        return await sync_to_async(self.process_login)(request, body, response)
+
+    def process_login(self, request, body, response):
+        # Obter conteúdo da requisição
+        content_type = request.headers.get("Content-Type", '').lower()
+
+        # Obter email ou None - em formulários ou JSON
+        if 'application/json' in content_type:
+
+            # Se o conteúdo for um JSON:
+            try:
+                email = json.loads(body.decode('utf-8')).get('email')
+            except (json.JSONDecodeError, UnicodeDecodeError, AttributeError):
                 email = None
 
-            # Se o email for recebido:
-            if email:
-                user = User.objects.get(email=email)
+        elif 'application/x-www-form-urlencoded' in content_type:
+
+            # Se o conteúdo for um formulário:
+            email = request.POST.get('email')
+
+        else:
+            email = None
+
+        # Se o email for recebido:
+        if email:
+            return self.check_attempts(str(email), response)
+
+        return response
+
+    def check_attempts(self, email, response):
+        # Lê apenas as colunas necessárias; os contadores ficam no throttle store
+        user = (User.objects.filter(email=email)
+                .values('id', 'created_at', 'locked_at', 'unlocked_at')
+                .first())
+        if user is None:
+            return response
+
+        now = timezone.now()
+
+        # Se o usuário foi criado há menos de 3 minutos
+        if now <= (user['created_at'] + timezone.timedelta(minutes=3)):
+            return JsonResponse(
+                {'detail': 'Sua conta está em análise. Tente novamente mais tarde'},
+                status=status.HTTP_401_UNAUTHORIZED
+            )
+
+        key = f"user:{user['id']}"
+
+        # Se o login estiver errado:
+        if response.status_code == status.HTTP_401_UNAUTHORIZED:
+            attempts = self.store.incr(key, int(self.lock_time.total_seconds()))
 
-                # Se o usuário foi criado há menos de 3 minutos
-                if timezone.now() <= (user.created_at + timezone.timedelta(minutes=3)):
-                    return JsonResponse(
-                    {'detail': 'Sua conta está em análise. Tente novamente mais tarde'},
+            # Se 3 tentativas erradas, bloquear o usuário por 15 minutos
+            if attempts == self.max_attempts:
+                self.store.delete(key)
+                User.objects.filter(id=user['id']).update(
+                    login_attempts=attempts,
+                    locked_at=now,
+                    unlocked_at=now + self.lock_time,
+                )
+                # Tokens já emitidos também deixam de valer durante o bloqueio
+                authentication.invalidate_user(user['id'])
+
+                return JsonResponse(
+                    {'detail': 'Conta bloqueada. Tente novamente em 15 minutos'},
                     status=status.HTTP_401_UNAUTHORIZED
-                )    
-
-                # Se o login estiver errado:
-                if user and response.status_code == status.HTTP_401_UNAUTHORIZED:
-                    user.login_attempts += 1
-                    user.save()
-
-                    # Se 3 tentativas erradas, bloquear o usuário por 15 minutos
-                    if user.login_attempts == 3:
-                        user.locked_at = timezone.now()
-                        user.unlocked_at = timezone.now() + timezone.timedelta(minutes=15)
-                        user.save()
-                        
-                        return JsonResponse(
-                            {'detail': 'Conta bloqueada. Tente novamente em 15 minutos'},
-                            status=status.HTTP_401_UNAUTHORIZED
-                        )
-                
-                if user.login_attempts >= 3 and user.locked_at is not None and user.unlocked_at is not None and response.status_code == status.HTTP_200_OK:
-                    if timezone.now() >= user.unlocked_at:
-                        user.login_attempts = 0
-                        user.locked_at = None
-                        user.unlocked_at = None
-                        user.save()
-                    else:
-                        return JsonResponse(
-                            {'detail': 'Sua conta foi bloqueada. Tente novamente mais tarde'},
-                            status=status.HTTP_418_IM_A_TEAPOT
-                        )
-        
+                )
+
+        if response.status_code == status.HTTP_200_OK:
+            self.store.delete(key)
+
+        if user['locked_at'] is not None and user['unlocked_at'] is not None and response.status_code == status.HTTP_200_OK:
+            if now >= user['unlocked_at']:
+                User.objects.filter(id=user['id']).update(login_attempts=0, locked_at=None, unlocked_at=None)
+                authentication.invalidate_user(user['id'])
+            else:
+                return JsonResponse(
+                    {'detail': 'Sua conta foi bloqueada. Tente novamente mais tarde'},
+                    status=status.HTTP_418_IM_A_TEAPOT
+                )
+
         return response
+
+
+""" Middleware de perfil: queries, tempo de banco, de serialização e total por rota
+"""
+class QueryProfilingMiddleware:
+    # Como o LoginAttemptsMiddleware, não força troca de thread nas views assíncronas
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        # Desligado, o Django remove o middleware da cadeia (custo zero)
+        if not getattr(settings, 'PROFILING_ENABLED', False):
+            raise MiddlewareNotUsed()
+
+        self.get_response = get_response
+        self.store = profiling.ProfileStore(window=getattr(settings, 'PROFILING_WINDOW', 1000))
+        self.directory = getattr(settings, 'PROFILING_DIR', None)
+        self.flush_every = getattr(settings, 'PROFILING_FLUSH_EVERY', 100)
+        profiling.install_serializer_timer()
+        connection_created.connect(profiling.install_query_timer)
+        for connection in connections.all():
+            profiling.install_query_timer(connection)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        profile, token = profiling.start()
+        begin = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            profiling.stop(token)
+
+        if self.record(request, response, time.perf_counter() - begin, profile):
+            self.store.flush(self.directory)
+        return response
+
+    async def __acall__(self, request):
+        # As queries do ORM assíncrono rodam em threads (sync_to_async) que
+        # herdam o contexto, então o mesmo RequestProfile é atualizado
+        profile, token = profiling.start()
+        begin = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            profiling.stop(token)
+
+        if self.record(request, response, time.perf_counter() - begin, profile):
+            await sync_to_async(self.store.flush)(self.directory)
+        return response
+
+    def record(self, request, response, total, profile):
+        # Registra a amostra; retorna True quando é hora de gravar o arquivo
+        response['Server-Timing'] = profiling.server_timing(total, profile)
+
+        match = request.resolver_match
+        route = f"{request.method} /{match.route}" if match else f"{request.method} <unresolved>"
+        recorded = self.store.record(route, total, profile)
+        return bool(self.directory) and recorded % self.flush_every == 0
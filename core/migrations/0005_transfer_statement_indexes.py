@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-17 20:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_transfer_created_at'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transfer',
+            index=models.Index(fields=['sender', 'created_at'], name='transfer_sender_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transfer',
+            index=models.Index(fields=['receiver', 'created_at'], name='transfer_receiver_created_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-17 20:53
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_transfer_statement_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AccountBalanceSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('balance', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('last_transfer_id', models.BigIntegerField()),
+                ('taken_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='core.account')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='accountbalancesnapshot',
+            constraint=models.UniqueConstraint(fields=('account', 'last_transfer_id'), name='snapshot_account_watermark_uniq'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 4.2.7 on 2026-10-17 21:02
+
+import random
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def renumber_duplicates(apps, schema_editor):
+    # Números gerados aleatoriamente podem ter colidido; mantém a conta mais antiga
+    # e dá um número novo às demais antes de criar a restrição de unicidade
+    Account = apps.get_model('core', 'Account')
+    duplicates = (Account.objects.values('agency', 'number')
+                  .annotate(total=Count('id')).filter(total__gt=1))
+
+    for duplicate in duplicates:
+        accounts = Account.objects.filter(agency=duplicate['agency'], number=duplicate['number']).order_by('id')
+        for account in accounts[1:]:
+            number = account.number
+            while Account.objects.filter(agency=account.agency, number=number).exists():
+                number = "".join(str(random.randint(0, 9)) for _ in range(16))
+            account.number = number
+            account.save(update_fields=['number'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_account_balance_snapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AccountNumberSequence',
+            fields=[
+                ('agency', models.CharField(max_length=4, primary_key=True, serialize=False)),
+                ('next_value', models.BigIntegerField(default=1)),
+            ],
+        ),
+        migrations.RunPython(renumber_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='account',
+            constraint=models.UniqueConstraint(fields=('agency', 'number'), name='account_agency_number_uniq'),
+        ),
+    ]
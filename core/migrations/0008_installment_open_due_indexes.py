@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-17 21:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_account_number_allocation'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='creditinstallments',
+            index=models.Index(condition=models.Q(('payed_date__isnull', True)), fields=['due_date', 'id'], name='creditinst_open_due_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='loaninstallments',
+            index=models.Index(condition=models.Q(('payed_date__isnull', True)), fields=['due_date', 'id'], name='loaninst_open_due_idx'),
+        ),
+    ]
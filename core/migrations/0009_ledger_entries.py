@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-17 21:19
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_installment_open_due_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='account',
+            name='ledger_applied_id',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='LedgerEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('account', models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, to='core.account')),
+                ('transfer', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='core.transfer')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['account', 'id'], name='ledger_account_id_idx')],
+            },
+        ),
+    ]
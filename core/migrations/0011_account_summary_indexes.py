@@ -0,0 +1,48 @@
+# Generated by Django 4.2.7 on 2026-10-17 21:30
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_idempotency_keys'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='transfer',
+            name='transfer_sender_created_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='transfer',
+            name='transfer_receiver_created_idx',
+        ),
+        migrations.AlterField(
+            model_name='transfer',
+            name='receiver',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='receiver', to='core.account'),
+        ),
+        migrations.AlterField(
+            model_name='transfer',
+            name='sender',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='sender', to='core.account'),
+        ),
+        migrations.AddIndex(
+            model_name='creditinstallments',
+            index=models.Index(condition=models.Q(('payed_date__isnull', True)), fields=['creditId', 'value'], name='creditinst_open_credit_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='loaninstallments',
+            index=models.Index(condition=models.Q(('payed_date__isnull', True)), fields=['loanId', 'value'], name='loaninst_open_loan_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transfer',
+            index=models.Index(fields=['sender', 'created_at', 'value'], name='transfer_sender_cover_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transfer',
+            index=models.Index(fields=['receiver', 'created_at', 'value'], name='transfer_receiver_cover_idx'),
+        ),
+    ]
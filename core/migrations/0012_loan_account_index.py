@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-17 21:32
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_account_summary_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='loan',
+            name='account',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, to='core.account'),
+        ),
+        migrations.AddIndex(
+            model_name='loan',
+            index=models.Index(fields=['account', 'request_date', 'id'], name='loan_account_requested_idx'),
+        ),
+    ]
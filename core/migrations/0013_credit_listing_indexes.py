@@ -0,0 +1,31 @@
+# Generated by Django 4.2.7 on 2026-10-17 21:36
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_loan_account_index'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='creditinstallments',
+            name='creditinst_open_credit_idx',
+        ),
+        migrations.AlterField(
+            model_name='credit',
+            name='account',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, to='core.account'),
+        ),
+        migrations.AddIndex(
+            model_name='credit',
+            index=models.Index(fields=['account', 'date', 'id'], name='credit_account_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='creditinstallments',
+            index=models.Index(condition=models.Q(('payed_date__isnull', True)), fields=['creditId', 'due_date', 'value'], name='creditinst_open_credit_idx'),
+        ),
+    ]
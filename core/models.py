@@ -64,42 +64,146 @@ class Account(models.Model):
     number = models.CharField(max_length=16)
     nickname = models.CharField(max_length=255)
     user = models.ForeignKey( settings.AUTH_USER_MODEL, on_delete=models.PROTECT)
+    # Saldo compactado até o lançamento `ledger_applied_id`; o saldo atual
+    # soma os lançamentos posteriores (core.ledger.balance)
     balance = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    ledger_applied_id = models.BigIntegerField(default=0)
     created_at = models.DateTimeField(default=timezone.now)
 
+    class Meta:
+        # Garante números únicos por agência e indexa a busca por agência + número
+        constraints = [
+            models.UniqueConstraint(fields=['agency', 'number'], name='account_agency_number_uniq'),
+        ]
+
     def __str__(self) -> str:
         return f"{self.agency} {self.number}"
+
+class AccountNumberSequence(models.Model):
+    agency = models.CharField(max_length=4, primary_key=True)
+    next_value = models.BigIntegerField(default=1) # próximo número ainda não reservado
     
 class Transfer(models.Model):
-    sender = models.ForeignKey(Account, on_delete=models.PROTECT, related_name="sender", null=True)
-    receiver = models.ForeignKey(Account, on_delete=models.PROTECT, related_name="receiver", null=True)
+    # Sem índice próprio: os índices compostos abaixo começam por sender/receiver
+    sender = models.ForeignKey(Account, on_delete=models.PROTECT, related_name="sender", null=True, db_index=False)
+    receiver = models.ForeignKey(Account, on_delete=models.PROTECT, related_name="receiver", null=True, db_index=False)
     value = models.DecimalField(max_digits=10,decimal_places=2)
     description = models.CharField(max_length=255, null=True, blank=True)
     created_at = models.DateTimeField(default=timezone.now)
 
+    class Meta:
+        # Índices usados pelo extrato (paginação por created_at em cada lado);
+        # com o valor no fim, também cobrem as somas do resumo da conta
+        indexes = [
+            models.Index(fields=['sender', 'created_at', 'value'], name='transfer_sender_cover_idx'),
+            models.Index(fields=['receiver', 'created_at', 'value'], name='transfer_receiver_cover_idx'),
+        ]
+
+class LedgerEntry(models.Model):
+    # Perna de um lançamento em partidas dobradas; só recebe INSERTs. As pernas
+    # de uma transferência somam zero; conta nula é a contrapartida externa
+    # de depósitos e saques
+    account = models.ForeignKey(Account, on_delete=models.PROTECT, null=True)
+    transfer = models.ForeignKey(Transfer, on_delete=models.PROTECT)
+    amount = models.DecimalField(max_digits=10, decimal_places=2) # positivo = crédito, negativo = débito
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        # Cauda ainda não compactada de cada conta (id > ledger_applied_id)
+        indexes = [
+            models.Index(fields=['account', 'id'], name='ledger_account_id_idx'),
+        ]
+
 class Loan(models.Model):
-    account = models.ForeignKey(Account, on_delete=models.PROTECT)
+    # Sem índice próprio: o índice composto abaixo começa pela conta
+    account = models.ForeignKey(Account, on_delete=models.PROTECT, db_index=False)
     installments = models.IntegerField()
     request_date = models.DateTimeField(default=timezone.now)
     payed = models.BooleanField(default=False)
     value = models.DecimalField(max_digits=10, decimal_places=2) # original value
     fees = models.DecimalField(max_digits=5,decimal_places=3, default=1.025) # % of fees
 
+    class Meta:
+        # Listagem dos empréstimos das contas do usuário, paginada por (request_date, id)
+        indexes = [
+            models.Index(fields=['account', 'request_date', 'id'], name='loan_account_requested_idx'),
+        ]
+
 class LoanInstallments(models.Model):
     loanId = models.ForeignKey(Loan, on_delete=models.CASCADE)
     payed_date = models.DateTimeField(null=True)
     due_date = models.DateTimeField(null=False)
     value = models.DecimalField(max_digits=10,decimal_places=2) # value with fee added
 
+    class Meta:
+        # Parcelas em aberto por vencimento (usado pela cobrança)
+        indexes = [
+            models.Index(fields=['due_date', 'id'], condition=models.Q(payed_date__isnull=True),
+                         name='loaninst_open_due_idx'),
+            # Saldo em aberto por contrato (resumo da conta), sem ler a tabela
+            models.Index(fields=['loanId', 'value'], condition=models.Q(payed_date__isnull=True),
+                         name='loaninst_open_loan_idx'),
+        ]
+
 class Credit(models.Model):
-    account = models.ForeignKey(Account, on_delete=models.PROTECT)
+    # Sem índice próprio: o índice composto abaixo começa pela conta
+    account = models.ForeignKey(Account, on_delete=models.PROTECT, db_index=False)
     installments = models.IntegerField()
     value = models.DecimalField(max_digits=10, decimal_places=2)
     date = models.DateTimeField(default=timezone.now)
     payed = models.BooleanField(default=False)
 
+    class Meta:
+        # Listagem dos créditos das contas do usuário, paginada por (date, id)
+        indexes = [
+            models.Index(fields=['account', 'date', 'id'], name='credit_account_date_idx'),
+        ]
+
 class CreditInstallments(models.Model):
     creditId = models.ForeignKey(Credit, on_delete=models.PROTECT)
     payed_date = models.DateTimeField(null=True)
     due_date = models.DateTimeField(null=False)
     value = models.DecimalField(max_digits=10,decimal_places=2)
+
+    class Meta:
+        # Parcelas em aberto por vencimento (usado pela cobrança)
+        indexes = [
+            models.Index(fields=['due_date', 'id'], condition=models.Q(payed_date__isnull=True),
+                         name='creditinst_open_due_idx'),
+            # Saldo em aberto e próximo vencimento por contrato (resumo da conta e
+            # listagem de créditos), sem ler a tabela
+            models.Index(fields=['creditId', 'due_date', 'value'], condition=models.Q(payed_date__isnull=True),
+                         name='creditinst_open_credit_idx'),
+        ]
+
+class AccountBalanceSnapshot(models.Model):
+    account = models.ForeignKey(Account, on_delete=models.PROTECT)
+    balance = models.DecimalField(max_digits=10, decimal_places=2) # saldo de fechamento
+    last_transfer_id = models.BigIntegerField() # última transferência incluída no saldo
+    taken_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['account', 'last_transfer_id'], name='snapshot_account_watermark_uniq'),
+        ]
+
+class IdempotencyKey(models.Model):
+    # Resposta de uma requisição que movimenta dinheiro, guardada pela chave
+    # do cabeçalho Idempotency-Key para ser devolvida nas repetições
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    key = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=64) # sha256 do método, caminho e corpo
+    # Preenchidos ao fim da requisição, na mesma transação em que a chave é
+    # reservada: para as outras conexões a linha já nasce com a resposta
+    status_code = models.PositiveSmallIntegerField(null=True)
+    response = models.JSONField(null=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='idempotency_user_key_uniq'),
+        ]
+        # Expiração por TTL (manage.py purge_idempotency_keys)
+        indexes = [
+            models.Index(fields=['created_at'], name='idempotency_created_idx'),
+        ]
@@ -0,0 +1,157 @@
+""" Medição de queries e tempos por rota (usado pelo QueryProfilingMiddleware)
+
+Cada requisição acumula, em um `RequestProfile`, o número de queries, o
+tempo gasto no banco e na serialização do DRF. As amostras ficam em uma
+janela deslizante por rota e são gravadas periodicamente em um arquivo
+JSON por processo, lido pelo comando `manage.py perfreport`.
+"""
+import contextvars
+import json
+import os
+import statistics
+import threading
+import time
+from collections import deque
+
+_current = contextvars.ContextVar('request_profile', default=None)
+
+
+def percentiles(samples, points=(50, 95, 99)):
+    # Retorna os percentis pedidos (em ms) de uma lista de durações em segundos
+    if not samples:
+        return {f'p{p}': 0.0 for p in points}
+    if len(samples) == 1:
+        return {f'p{p}': samples[0] * 1000 for p in points}
+
+    cuts = statistics.quantiles(samples, n=100, method='inclusive')
+    return {f'p{p}': cuts[p - 1] * 1000 for p in points}
+
+
+class RequestProfile:
+    __slots__ = ('queries', 'db_time', 'serializer_time')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+
+
+def start():
+    profile = RequestProfile()
+    return profile, _current.set(profile)
+
+
+def stop(token):
+    _current.reset(token)
+
+
+def install_query_timer(connection, **kwargs):
+    # Receptor de `connection_created`: o cronômetro fica em cada conexão de
+    # cada thread (inclusive as do ORM assíncrono) e só mede quando há um
+    # RequestProfile no contexto
+    if timed_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(timed_query)
+
+
+def timed_query(execute, sql, params, many, context):
+    # Wrapper de execução (connection.execute_wrappers); conta e cronometra cada query
+    profile = _current.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+
+    begin = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        profile.db_time += time.perf_counter() - begin
+        profile.queries += 1
+
+
+_serializer_timer_installed = False
+
+
+def install_serializer_timer():
+    """Envolve `BaseSerializer.data` para medir o tempo de serialização.
+
+    `Serializer.data` e `ListSerializer.data` chamam `BaseSerializer.data`
+    uma única vez por serializador de topo, então serializadores aninhados
+    não são contados em dobro.
+    """
+    global _serializer_timer_installed
+    if _serializer_timer_installed:
+        return
+
+    from rest_framework.serializers import BaseSerializer
+
+    original = BaseSerializer.data
+
+    def data(self):
+        profile = _current.get()
+        if profile is None:
+            return original.fget(self)
+        begin = time.perf_counter()
+        try:
+            return original.fget(self)
+        finally:
+            profile.serializer_time += time.perf_counter() - begin
+
+    BaseSerializer.data = property(data)
+    _serializer_timer_installed = True
+
+
+class ProfileStore:
+    """Janela deslizante das últimas `window` amostras de cada rota"""
+
+    def __init__(self, window=1000):
+        self.window = window
+        self.routes = {}
+        self.lock = threading.Lock()
+        self.recorded = 0
+
+    def record(self, route, total, profile):
+        sample = (total, profile.db_time, profile.serializer_time, profile.queries)
+        with self.lock:
+            samples = self.routes.get(route)
+            if samples is None:
+                samples = self.routes[route] = deque(maxlen=self.window)
+            samples.append(sample)
+            self.recorded += 1
+            return self.recorded
+
+    def snapshot(self):
+        with self.lock:
+            return {route: list(samples) for route, samples in self.routes.items()}
+
+    def flush(self, directory):
+        # Grava a janela atual em <directory>/perf-<pid>.json (escrita atômica)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f'perf-{os.getpid()}.json')
+        tmp = f'{path}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.snapshot(), f)
+        os.replace(tmp, path)
+
+
+def summarize(samples):
+    """Resumo (p50/p95/p99 em ms e médias) de uma lista de amostras"""
+    totals = sorted(s[0] for s in samples)
+    count = len(samples) or 1
+    return {
+        'count': len(samples),
+        'total': percentiles(totals),
+        'db': percentiles(sorted(s[1] for s in samples)),
+        'serializer': percentiles(sorted(s[2] for s in samples)),
+        'queries': {
+            'avg': sum(s[3] for s in samples) / count,
+            'max': max((s[3] for s in samples), default=0),
+        },
+    }
+
+
+def server_timing(total, profile):
+    # Valor do header Server-Timing (durações em ms)
+    return (
+        f'db;dur={profile.db_time * 1000:.2f};desc="{profile.queries} queries", '
+        f'serializer;dur={profile.serializer_time * 1000:.2f}, '
+        f'total;dur={total * 1000:.2f}'
+    )
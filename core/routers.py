@@ -0,0 +1,88 @@
+""" Roteamento de leituras para réplicas
+
+Por padrão tudo vai para o banco `default` (primário). Views que usam o
+`ReplicaReadMixin` liberam, nas requisições de leitura, o uso de uma das
+réplicas de `settings.READ_REPLICAS`. A escolha vale só para a requisição
+corrente (contextvar) e volta ao primário assim que:
+
+- a requisição escreve alguma coisa (leitura depois da escrita);
+- há uma transação aberta no primário;
+- o usuário escreveu nos últimos `REPLICA_STICKY_SECONDS` segundos, para
+  que o saldo não apareça desatualizado enquanto a réplica alcança o
+  primário. A marca fica no cache do Django; com vários processos, o
+  cache precisa ser compartilhado (Redis/Memcached).
+"""
+import contextvars
+import random
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, connections
+
+_replica = contextvars.ContextVar('read_replica', default=None)
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+def _sticky_key(user_id):
+    return f"db:primary:user:{user_id}"
+
+
+def _cache():
+    return caches[getattr(settings, 'REPLICA_STICKY_CACHE', 'default')]
+
+
+def mark_written(user_id):
+    """Manda as leituras do usuário para o primário durante a janela de replicação"""
+    timeout = getattr(settings, 'REPLICA_STICKY_SECONDS', 5)
+    if timeout:
+        _cache().set(_sticky_key(user_id), True, timeout)
+
+
+def is_sticky(user_id):
+    return bool(_cache().get(_sticky_key(user_id)))
+
+
+def choose_replica():
+    replicas = getattr(settings, 'READ_REPLICAS', [])
+    return random.choice(replicas) if replicas else None
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        alias = _replica.get()
+        if alias is None or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return alias
+
+    def db_for_write(self, model, **hints):
+        # Qualquer escrita fixa o restante da requisição no primário
+        _replica.set(None)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Réplicas têm os mesmos dados do primário
+        return True
+
+
+class ReplicaReadMixin:
+    """Mixin de APIView: leituras (GET/HEAD/OPTIONS) podem usar uma réplica"""
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        # Depois da autenticação, que sempre lê o usuário no primário
+        user_id = request.user.pk
+        if request.method not in SAFE_METHODS:
+            if user_id is not None:
+                mark_written(user_id)
+            return
+
+        if user_id is None or not is_sticky(user_id):
+            self._replica_token = _replica.set(choose_replica())
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        token = getattr(self, '_replica_token', None)
+        if token is not None:
+            _replica.reset(token)
+            self._replica_token = None
+        return super().finalize_response(request, response, *args, **kwargs)
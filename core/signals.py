@@ -0,0 +1,10 @@
+""" Sinais enviados pelo core para as demais apps
+
+O core não importa as outras apps; quem mantém estado derivado (ex.: o
+cache de respostas da API) se inscreve nestes sinais no seu AppConfig.ready.
+"""
+from django.dispatch import Signal
+
+# Enviado pela cobrança em lote depois que um bloco de parcelas é pago e
+# confirmado. Argumentos: kind ('loan' ou 'credit') e accounts (ids debitados)
+installments_collected = Signal()
@@ -0,0 +1,108 @@
+""" Resumo de uma conta: entradas, saídas e saldo em aberto de empréstimos e créditos
+
+Tudo é calculado no banco, em no máximo duas queries:
+
+1. a conta (já filtrada pelo dono), com o saldo atual e os totais em
+   aberto de empréstimos e créditos em subqueries correlacionadas;
+2. as entradas e saídas no período, com Sum/Count condicionais sobre as
+   transferências em que a conta é origem ou destino, agrupadas por dia
+   ou mês quando pedido.
+
+Os índices que cobrem essas consultas estão em Transfer
+((sender|receiver, created_at, value)) e nas parcelas em aberto, onde
+payed_date é nulo: (loanId, value) e (creditId, due_date, value).
+"""
+import datetime
+
+from django.db.models import Count, DecimalField, IntegerField, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, TruncDay, TruncMonth
+from django.utils import timezone
+
+from core import ledger
+from core.models import Account, CreditInstallments, LoanInstallments, Transfer
+
+ZERO = ledger.ZERO
+BUCKETS = {'day': TruncDay, 'month': TruncMonth}
+
+
+def _open_installments(model, account_path):
+    # (total, quantidade) das parcelas em aberto da conta, como subqueries
+    rows = (model.objects
+            .filter(**{account_path: OuterRef('pk')}, payed_date__isnull=True)
+            .values(account_path))
+    total = Subquery(rows.annotate(total=Sum('value')).values('total'))
+    count = Subquery(rows.annotate(count=Count('id')).values('count'))
+    return (
+        Coalesce(total, Value(ZERO), output_field=DecimalField(max_digits=12, decimal_places=2)),
+        Coalesce(count, Value(0), output_field=IntegerField()),
+    )
+
+
+def _period(queryset, start=None, end=None):
+    # Datas inclusivas, como no extrato exportado
+    if start is not None:
+        queryset = queryset.filter(created_at__gte=timezone.make_aware(
+            datetime.datetime.combine(start, datetime.time.min)))
+    if end is not None:
+        queryset = queryset.filter(created_at__lt=timezone.make_aware(
+            datetime.datetime.combine(end + datetime.timedelta(days=1), datetime.time.min)))
+    return queryset
+
+
+def _flows(account_id):
+    incoming, outgoing = Q(receiver=account_id), Q(sender=account_id)
+    return {
+        'money_in': Coalesce(Sum('value', filter=incoming), Value(ZERO)),
+        'count_in': Count('id', filter=incoming),
+        'money_out': Coalesce(Sum('value', filter=outgoing), Value(ZERO)),
+        'count_out': Count('id', filter=outgoing),
+    }
+
+
+def account_summary(account_id, user, start=None, end=None, bucket=None):
+    """Resumo da conta `account_id` do usuário; None se ela não existir ou não for dele.
+
+    `bucket` ('day' ou 'month') inclui as entradas e saídas por período.
+    """
+    loan_total, loan_count = _open_installments(LoanInstallments, 'loanId__account')
+    credit_total, credit_count = _open_installments(CreditInstallments, 'creditId__account')
+    account = (ledger.with_balance(Account.objects.filter(pk=account_id, user=user))
+               .annotate(loan_total=loan_total, loan_count=loan_count,
+                         credit_total=credit_total, credit_count=credit_count)
+               .values('id', 'current_balance', 'loan_total', 'loan_count', 'credit_total', 'credit_count')
+               .first())
+    if account is None:
+        return None
+
+    transfers = _period(Transfer.objects.filter(Q(sender=account['id']) | Q(receiver=account['id'])), start, end)
+    if bucket is None:
+        flows = transfers.aggregate(**_flows(account['id']))
+        buckets = None
+    else:
+        # Uma linha por dia/mês, na mesma query; o total é a soma das linhas
+        rows = list(transfers
+                    .annotate(period=BUCKETS[bucket]('created_at'))
+                    .values('period').annotate(**_flows(account['id']))
+                    .order_by('period'))
+        flows = {name: sum((row[name] for row in rows), ZERO if name.startswith('money') else 0)
+                 for name in ('money_in', 'count_in', 'money_out', 'count_out')}
+        buckets = [
+            {'period': row['period'].date(), **{name: row[name] for name in flows}}
+            for row in rows
+        ]
+
+    summary = {
+        'account': account['id'],
+        'balance': account['current_balance'],
+        'start': start,
+        'end': end,
+        'money_in': {'total': flows['money_in'], 'count': flows['count_in']},
+        'money_out': {'total': flows['money_out'], 'count': flows['count_out']},
+        'net': flows['money_in'] - flows['money_out'],
+        'loans': {'open_balance': account['loan_total'], 'open_installments': account['loan_count']},
+        'credits': {'open_balance': account['credit_total'], 'open_installments': account['credit_count']},
+    }
+    if buckets is not None:
+        summary['bucket'] = bucket
+        summary['buckets'] = buckets
+    return summary
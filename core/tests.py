@@ -0,0 +1,131 @@
+import datetime
+import decimal
+
+from django.db.models import Sum
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from core import collection, idempotency, ledger
+from core.models import Account, LedgerEntry, Loan, LoanInstallments, User
+
+
+class LedgerTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('ledger@fastbank.com', 'test', cpf='52998224725')
+        self.sender = Account.objects.create(user=self.user, agency='0001', number='0' * 16, nickname='sender')
+        self.receiver = Account.objects.create(user=self.user, agency='0001', number='1' * 16, nickname='receiver')
+
+
+class LedgerTests(LedgerTestCase):
+    def test_transfer_moves_balance_and_legs_sum_to_zero(self):
+        ledger.deposit(self.sender.id, 100)
+        ledger.transfer(self.sender.id, self.receiver.id, '30.00', user=self.user)
+
+        self.assertEqual(ledger.balances([self.sender.id, self.receiver.id]),
+                         {self.sender.id: 70, self.receiver.id: 30})
+        # Partidas dobradas: a contrapartida externa fecha a soma em zero
+        self.assertEqual(LedgerEntry.objects.aggregate(total=Sum('amount'))['total'], 0)
+
+    def test_insufficient_balance_changes_nothing(self):
+        ledger.deposit(self.sender.id, 10)
+        with self.assertRaises(ledger.InsufficientBalance):
+            ledger.transfer(self.sender.id, self.receiver.id, '10.01', user=self.user)
+
+        self.assertEqual(ledger.balance(self.sender.id), 10)
+        self.assertEqual(ledger.balance(self.receiver.id), 0)
+
+    def test_compaction_keeps_balances(self):
+        ledger.deposit(self.sender.id, 100)
+        ledger.transfer(self.sender.id, self.receiver.id, '25.00', user=self.user)
+        before = ledger.balances([self.sender.id, self.receiver.id])
+
+        watermark, updated = ledger.compact(lag=0)
+        self.assertEqual(updated, 2)
+        self.assertEqual(ledger.balances([self.sender.id, self.receiver.id]), before)
+
+        # A cauda foi incorporada ao saldo guardado
+        self.sender.refresh_from_db()
+        self.assertEqual(self.sender.ledger_applied_id, watermark)
+        self.assertEqual(self.sender.balance, before[self.sender.id])
+
+        # Rodar de novo sem lançamentos novos não altera nada
+        self.assertEqual(ledger.compact(lag=0), (watermark, 0))
+        ledger.withdraw(self.sender.id, 5, user=self.user)
+        self.assertEqual(ledger.balance(self.sender.id), before[self.sender.id] - 5)
+
+
+class CollectionTests(LedgerTestCase):
+    def setUp(self):
+        super().setUp()
+        ledger.deposit(self.sender.id, 100)
+        self.loan = Loan.objects.create(account=self.sender, installments=2, value=decimal.Decimal('20.00'))
+        due = timezone.now() - datetime.timedelta(days=1)
+        LoanInstallments.objects.bulk_create([
+            LoanInstallments(loanId=self.loan, value=decimal.Decimal('10.00'), due_date=due) for _ in range(2)
+        ])
+
+    def test_collect_twice_charges_once(self):
+        first = list(collection.collect('loan'))
+        second = list(collection.collect('loan'))
+
+        self.assertEqual(sum(result.paid for result in first), 2)
+        self.assertEqual(second, [])
+        self.assertEqual(ledger.balance(self.sender.id), 80)
+        self.assertFalse(LoanInstallments.objects.filter(payed_date__isnull=True).exists())
+        self.loan.refresh_from_db()
+        self.assertTrue(self.loan.payed)
+
+    def test_stale_chunk_is_not_charged_again(self):
+        # Bloco lido antes de outra execução pagar as mesmas parcelas
+        kind = collection.KINDS['loan']
+        rows = collection._open_installments(kind, timezone.now(), 100)
+        list(collection.collect('loan'))
+
+        result = collection._collect_chunk('loan', kind, rows, timezone.now())
+        self.assertEqual(result.paid, 0)
+        self.assertEqual(ledger.balance(self.sender.id), 80)
+
+    def test_account_without_balance_is_skipped(self):
+        ledger.withdraw(self.sender.id, 95, user=self.user)
+
+        results = list(collection.collect('loan'))
+        self.assertEqual(sum(result.paid for result in results), 0)
+        self.assertEqual(sum(result.skipped for result in results), 2)
+        self.assertEqual(ledger.balance(self.sender.id), 5)
+
+
+class IdempotencyTests(LedgerTestCase):
+    def setUp(self):
+        super().setUp()
+        ledger.deposit(self.sender.id, 100)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.body = {'sender': self.sender.id, 'receiver': self.receiver.id, 'value': '10.00'}
+
+    def post(self, key, body):
+        return self.client.post('/api/v1/transfer/', body, format='json', HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_replay_returns_stored_response(self):
+        first = self.post('replay-1', self.body)
+        second = self.post('replay-1', self.body)
+
+        self.assertEqual(second.status_code, first.status_code)
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(second[idempotency.REPLAYED_HEADER], 'true')
+        self.assertEqual(ledger.balance(self.sender.id), 90)
+
+    def test_replay_from_table_without_memory_cache(self):
+        self.post('replay-2', self.body)
+        idempotency.get_store().delete(idempotency._cache_key(self.user.pk, 'replay-2'))
+
+        response = self.post('replay-2', self.body)
+        self.assertEqual(response[idempotency.REPLAYED_HEADER], 'true')
+        self.assertEqual(ledger.balance(self.sender.id), 90)
+
+    def test_same_key_with_other_body_is_rejected(self):
+        self.post('replay-3', self.body)
+        response = self.post('replay-3', {**self.body, 'value': '20.00'})
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(ledger.balance(self.sender.id), 90)
@@ -0,0 +1,92 @@
+""" Armazenamento dos contadores de tentativas de login
+
+O LoginAttemptsMiddleware guarda as tentativas erradas aqui, e não na
+tabela de usuários. O backend é escolhido pela configuração
+`LOGIN_THROTTLE_STORE` (caminho pontuado da classe).
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.module_loading import import_string
+
+
+class CacheThrottleStore:
+    """Usa o framework de cache do Django (padrão; compartilhado entre processos se o cache for)"""
+    prefix = 'login-throttle:'
+
+    def __init__(self, alias='default'):
+        self.cache = caches[alias]
+
+    def get(self, key):
+        return self.cache.get(self.prefix + key)
+
+    def set(self, key, value, ttl):
+        self.cache.set(self.prefix + key, value, ttl)
+
+    def incr(self, key, ttl):
+        key = self.prefix + key
+        # add() só grava se a chave não existir; incr() é atômico nos backends que suportam
+        self.cache.add(key, 0, ttl)
+        try:
+            return self.cache.incr(key)
+        except ValueError:
+            # A chave expirou entre o add() e o incr()
+            self.cache.set(key, 1, ttl)
+            return 1
+
+    def delete(self, key):
+        self.cache.delete(self.prefix + key)
+
+
+class LocalThrottleStore:
+    """LRU em memória com expiração por TTL, para execuções em um único nó"""
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, key, now):
+        # Deve ser chamado com o lock adquirido
+        item = self._data.get(key)
+        if item is None:
+            return None
+        value, expires = item
+        if expires <= now:
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def _set(self, key, value, ttl, now):
+        self._data[key] = (value, now + ttl)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    def get(self, key):
+        with self._lock:
+            return self._get(key, time.monotonic())
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._set(key, value, ttl, time.monotonic())
+
+    def incr(self, key, ttl):
+        with self._lock:
+            now = time.monotonic()
+            value = (self._get(key, now) or 0) + 1
+            self._set(key, value, ttl, now)
+            return value
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+
+def get_throttle_store():
+    path = getattr(settings, 'LOGIN_THROTTLE_STORE', 'core.throttle.CacheThrottleStore')
+    return import_string(path)()
@@ -1,27 +1,54 @@
 from django.contrib.auth import get_user_model
+from django.db import transaction
 from rest_framework import serializers
 from django.utils.translation import gettext as _
 
+from core import authentication, images
+
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = get_user_model()
-        fields = ['id','email', 'password', 'first_name', 'last_name', 'cpf', 'url_image']
+        fields = ['id','email', 'password', 'first_name', 'last_name', 'cpf', 'url_image', 'thumbnails']
         extra_kwargs = {
             'password': {'write_only': True,
                          'min_length': 6},
             'is_active':{'read_onlly':True},
             'created_at':{'read_onlly':True},
         }
-    
+
+    # Miniaturas geradas em segundo plano (core.images); os clientes não
+    # precisam baixar o original para exibir o avatar
+    thumbnails = serializers.SerializerMethodField()
+
+    def get_thumbnails(self, obj):
+        urls = images.thumbnail_urls(obj.url_image.name if obj.url_image else None)
+        request = self.context.get('request')
+        if urls and request is not None:
+            # Absolutas, como a url_image
+            urls = {size: {fmt: request.build_absolute_uri(url) for fmt, url in by_format.items()}
+                    for size, by_format in urls.items()}
+        return urls
+
+    def _store_image(self, validated_data):
+        # Troca o arquivo enviado pelo nome do original deduplicado
+        image = validated_data.get('url_image')
+        if image:
+            name = validated_data['url_image'] = images.store_original(image)
+            transaction.on_commit(lambda: images.schedule_thumbnails(name))
+
     def create(self, validated_data):
+        self._store_image(validated_data)
         return get_user_model().objects.create_user(**validated_data)
     
     def update(self, instance, validated_data):
         password = validated_data.pop('password', None)
+        self._store_image(validated_data)
         user = super().update(instance=instance, validated_data=validated_data)
 
         if password:
             user.set_password(password)
             user.save()
 
+        # O principal em cache (is_active, hash da senha) pode ter mudado
+        transaction.on_commit(lambda: authentication.invalidate_user(user.pk))
         return user
\ No newline at end of file
@@ -0,0 +1,94 @@
+""" Upload de imagens de perfil em streaming
+
+O corpo multipart é lido em blocos direto para um arquivo temporário (o
+que vai para a memória é um bloco por vez, qualquer que seja o tamanho do
+arquivo). O tamanho é recusado pelo Content-Length antes de ler o corpo e,
+quando ele não é confiável, assim que os bytes recebidos passam do limite.
+O tipo declarado e os primeiros bytes do arquivo são conferidos já no
+primeiro bloco.
+"""
+from django.conf import settings
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from rest_framework import exceptions, status
+
+ALLOWED_CONTENT_TYPES = {'image/jpeg', 'image/png', 'image/gif', 'image/webp'}
+
+# Assinaturas (magic bytes) dos formatos aceitos
+SIGNATURES = (
+    (0, b'\xff\xd8\xff'),           # JPEG
+    (0, b'\x89PNG\r\n\x1a\n'),      # PNG
+    (0, b'GIF87a'),
+    (0, b'GIF89a'),
+    (8, b'WEBP'),                   # RIFF....WEBP
+)
+
+# Folga para os cabeçalhos multipart e demais campos do formulário
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+class UploadTooLarge(exceptions.APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = 'Arquivo maior que o tamanho máximo permitido.'
+    default_code = 'upload_too_large'
+
+
+class UnsupportedImage(exceptions.APIException):
+    status_code = status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
+    default_detail = 'Envie uma imagem JPEG, PNG, GIF ou WebP.'
+    default_code = 'unsupported_image'
+
+
+def max_upload_size():
+    return getattr(settings, 'USER_IMAGE_MAX_SIZE', 5 * 1024 * 1024)
+
+
+def looks_like_image(head):
+    return any(head[offset:offset + len(magic)] == magic for offset, magic in SIGNATURES)
+
+
+class ImageUploadHandler(TemporaryFileUploadHandler):
+    """Grava o upload em arquivo temporário, validando tipo e tamanho durante a leitura"""
+
+    def __init__(self, request=None, max_size=None):
+        super().__init__(request)
+        self.max_size = max_size or max_upload_size()
+        self.received = 0
+        self.checked = False
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        # Recusa antes de ler qualquer byte do corpo
+        if content_length and content_length > self.max_size + MULTIPART_OVERHEAD:
+            raise UploadTooLarge()
+
+    def new_file(self, field_name, file_name, content_type, *args, **kwargs):
+        if content_type not in ALLOWED_CONTENT_TYPES:
+            raise UnsupportedImage()
+        self.received = 0
+        self.checked = False
+        super().new_file(field_name, file_name, content_type, *args, **kwargs)
+
+    def receive_data_chunk(self, raw_data, start):
+        if not self.checked:
+            if not looks_like_image(raw_data[:16]):
+                self.file.close()
+                raise UnsupportedImage()
+            self.checked = True
+
+        self.received += len(raw_data)
+        if self.received > self.max_size:
+            self.file.close()
+            raise UploadTooLarge()
+        return super().receive_data_chunk(raw_data, start)
+
+
+class ImageUploadMixin:
+    """Mixin de APIView: requisições multipart usam o ImageUploadHandler.
+
+    Os handlers são trocados depois da autenticação e das permissões, então
+    um upload sem credenciais é recusado sem que o corpo seja lido.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.content_type.startswith('multipart/form-data'):
+            request._request.upload_handlers = [ImageUploadHandler(request._request)]
@@ -1,26 +1,29 @@
+from django.contrib.auth import get_user_model
 from rest_framework.response import Response
 from rest_framework import (
     status,
     generics
 )
-from rest_framework_simplejwt import authentication as authenticationJWT
 from user.serializers import UserSerializer
 from user.permissions import IsCreationOrIsAuthenticated
+from user.uploads import ImageUploadMixin
+from core.authentication import CachedJWTAuthentication
+from core.routers import ReplicaReadMixin
 
 from rest_framework.decorators import action
 
-class CreateUserView(generics.CreateAPIView):
+class CreateUserView(ImageUploadMixin, generics.CreateAPIView):
     """Create a new user in the system"""
     serializer_class = UserSerializer
 
-class ManagerUserApiView(generics.RetrieveUpdateAPIView, generics.CreateAPIView):
+class ManagerUserApiView(ImageUploadMixin, ReplicaReadMixin, generics.RetrieveUpdateAPIView, generics.CreateAPIView):
     serializer_class = UserSerializer
-    authentication_classes = [authenticationJWT.JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsCreationOrIsAuthenticated]
 
     def get_object(self):
-        """"""
-        return self.request.user
+        # request.user só tem o principal em cache; aqui precisamos do registro completo
+        return get_user_model().objects.get(pk=self.request.user.pk)
     
     @action(methods=['POST'], detail=True, url_path='upload-image')
     def upload_image(self, request, pk=None):